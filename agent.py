@@ -3,12 +3,14 @@ LangChain Agent - Yahoo Finance 工具调用
 基于 LangGraph (LangChain 1.x)
 """
 import logging
+from functools import lru_cache
 from typing import AsyncIterator
 
 from langgraph.prebuilt import create_react_agent
 from langchain_openai import ChatOpenAI
 from langchain_core.messages import HumanMessage, AIMessage, BaseMessage
 
+from cache import TTLCache
 from config import get_settings
 from tools import (
     get_stock_info,
@@ -157,32 +159,42 @@ Data may have delays. This is not financial advice. Always verify with official
 """
 
 
+@lru_cache(maxsize=8)
+def get_compiled_agent(model_name: str):
+    """
+    创建 LangGraph React Agent (按模型名缓存)
+    图、工具和 prompt 对所有对话都相同，只有消息历史不同 (每次调用时传入)，
+    因此同一模型的所有对话共享一个编译好的图和一个 ChatOpenAI 连接池。
+    """
+    settings = get_settings()
+    llm = ChatOpenAI(
+        model=model_name,
+        temperature=0,
+        streaming=True,
+        api_key=settings.openai_api_key,
+    )
+    
+    # 使用 LangGraph 的 create_react_agent
+    logger.info(f"Compiling agent graph for model: {model_name}")
+    return create_react_agent(
+        llm,
+        FINANCE_TOOLS,
+        prompt=SYSTEM_PROMPT
+    )
+
+
 class FinanceAgent:
-    """Yahoo Finance LangGraph Agent"""
+    """
+    Yahoo Finance LangGraph Agent
+    每个对话一个实例，只保存消息历史；图由同一模型的所有对话共享
+    """
     
     def __init__(self, model: str | None = None):
         settings = get_settings()
         self.model_name = model or settings.openai_model
         self.tools = FINANCE_TOOLS
         self.chat_history: list[BaseMessage] = []
-        self.agent = self._create_agent()
-    
-    def _create_agent(self):
-        """创建 LangGraph React Agent"""
-        settings = get_settings()
-        llm = ChatOpenAI(
-            model=self.model_name,
-            temperature=0,
-            streaming=True,
-            api_key=settings.openai_api_key,
-        )
-        
-        # 使用 LangGraph 的 create_react_agent
-        return create_react_agent(
-            llm,
-            self.tools,
-            prompt=SYSTEM_PROMPT
-        )
+        self.agent = get_compiled_agent(self.model_name)
     
     def load_history(self, messages: list[dict]):
         """从数据库加载历史消息"""
@@ -263,17 +275,37 @@ class FinanceAgent:
 
 
 # Agent 实例缓存 (按 conversation_id)
-_agent_cache: dict[str, FinanceAgent] = {}
+# 有界 LRU + 空闲超时；被淘汰的对话下次请求时重新创建，历史由路由从数据库加载
+_agent_cache: TTLCache | None = None
+
+
+def _get_agent_cache() -> TTLCache:
+    global _agent_cache
+    if _agent_cache is None:
+        settings = get_settings()
+        _agent_cache = TTLCache(
+            maxsize=settings.agent_cache_size,
+            ttl=settings.agent_cache_idle_seconds,
+            sliding=True,
+        )
+    return _agent_cache
 
 
 def get_agent(conversation_id: str, model: str | None = None) -> FinanceAgent:
     """获取或创建 Agent 实例"""
-    if conversation_id not in _agent_cache:
-        _agent_cache[conversation_id] = FinanceAgent(model=model)
-    return _agent_cache[conversation_id]
+    cache = _get_agent_cache()
+    agent = cache.get(conversation_id)
+    if agent is None:
+        agent = FinanceAgent(model=model)
+        cache.set(conversation_id, agent)
+    return agent
 
 
 def remove_agent(conversation_id: str):
     """移除 Agent 实例"""
-    if conversation_id in _agent_cache:
-        del _agent_cache[conversation_id]
+    _get_agent_cache().pop(conversation_id)
+
+
+def agent_cache_stats() -> dict:
+    """Agent 缓存统计 (大小、命中、LRU 淘汰、空闲过期)"""
+    return _get_agent_cache().stats()
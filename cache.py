@@ -0,0 +1,161 @@
+"""
+进程内 LRU + TTL 缓存 & 并发请求合并 (single-flight)
+"""
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Any, Callable, Hashable, TypeVar
+
+T = TypeVar("T")
+
+# 用于区分 "未命中" 和 "缓存了 None"
+MISSING = object()
+
+
+class TTLCache:
+    """
+    线程安全的 LRU 缓存，每个条目有独立的过期时间。
+    超过 maxsize 时淘汰最久未使用的条目。
+    sliding=True 时每次命中都会续期，即 TTL 表示 "空闲超时"。
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 60.0, sliding: bool = False):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.sliding = sliding
+        self._data: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()
+        self._lock = threading.Lock()
+
+        # 统计
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """读取缓存，过期条目视为未命中"""
+        now = time.monotonic()
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                self.misses += 1
+                return default
+
+            expires_at, value = item
+            if expires_at <= now:
+                del self._data[key]
+                self.expirations += 1
+                self.misses += 1
+                return default
+
+            if self.sliding:
+                self._data[key] = (now + self.ttl, value)
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: Hashable, value: Any, ttl: float | None = None):
+        """写入缓存，ttl 为 None 时使用默认 TTL"""
+        now = time.monotonic()
+        expires_at = now + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._purge_expired(now)
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def _purge_expired(self, now: float):
+        """
+        从最久未使用的一端清理已过期条目 (调用方需持有锁)。
+        sliding 模式下过期顺序与 LRU 顺序一致，可以清理干净；
+        否则遇到第一个未过期条目即停止。
+        """
+        while self._data:
+            key, (expires_at, _) = next(iter(self._data.items()))
+            if expires_at > now:
+                break
+            del self._data[key]
+            self.expirations += 1
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        """移除并返回条目"""
+        with self._lock:
+            item = self._data.pop(key, None)
+        return default if item is None else item[1]
+
+    def clear(self):
+        """清空缓存 (保留统计)"""
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> dict:
+        """命中率等统计信息"""
+        total = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
+
+
+class SingleFlight:
+    """
+    合并并发的相同调用: 同一 key 同时只有一个调用真正执行，
+    其余调用阻塞等待并共享它的结果 (或异常)。
+    """
+
+    def __init__(self):
+        self._inflight: dict[Hashable, Future] = {}
+        self._lock = threading.Lock()
+
+        # 统计
+        self.calls = 0      # 实际执行次数
+        self.coalesced = 0  # 被合并 (未执行、直接复用结果) 的次数
+
+    def do(self, key: Hashable, fn: Callable[[], T]) -> T:
+        """执行 fn，若相同 key 已在执行中则等待其结果"""
+        with self._lock:
+            future = self._inflight.get(key)
+            if future is None:
+                future = Future()
+                self._inflight[key] = future
+                self.calls += 1
+                leader = True
+            else:
+                self.coalesced += 1
+                leader = False
+
+        if not leader:
+            return future.result()
+
+        try:
+            result = fn()
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+
+    def stats(self) -> dict:
+        """合并统计"""
+        total = self.calls + self.coalesced
+        return {
+            "in_flight": len(self._inflight),
+            "calls": self.calls,
+            "coalesced": self.coalesced,
+            "coalesce_rate": round(self.coalesced / total, 4) if total else 0.0,
+        }
@@ -0,0 +1,215 @@
+"""
+WebSocket 客户端的有界发送队列
+
+每个连接一个队列 + 一个写协程，广播只负责入队，不等待任何客户端的网络发送；
+慢客户端只会让自己的队列变长，不影响其他客户端和 Redis 消费循环。
+
+队列满时的处理策略:
+- drop_oldest: 丢弃最早的一条
+- conflate:    按 symbol 合并进队列: 每个 symbol 的新记录替换它在队列中最近一次出现的记录，
+               队列中没有的 symbol 并入最后一帧；不丢弃任何 symbol 的最新数据
+- disconnect:  断开慢客户端
+
+throttle() 开启按间隔合并: 行情记录先进入 Conflator，每个间隔合并成一帧再入队。
+"""
+import asyncio
+import json
+import logging
+from collections import deque
+from typing import Any, Callable, Iterable, Literal
+
+from conflation import Conflator
+
+logger = logging.getLogger(__name__)
+
+OverflowPolicy = Literal["drop_oldest", "conflate", "disconnect"]
+
+# 排队中的控制消息 (订阅确认、错误) 上限，超过说明客户端只发不收，断开
+MAX_CONTROL_MESSAGES = 32
+
+
+def frame(parts: dict[str, str]) -> str:
+    """symbol → 记录 JSON 片段 拼成一帧 JSON 数组"""
+    return "[" + ", ".join(parts.values()) + "]"
+
+
+class ClientSender:
+    """单个 WebSocket 的发送队列和写协程"""
+
+    def __init__(
+        self,
+        websocket: Any,
+        maxsize: int,
+        policy: OverflowPolicy = "drop_oldest",
+        send_timeout: float | None = None,
+        on_close: Callable[["ClientSender"], None] | None = None,
+    ):
+        self.websocket = websocket
+        self.maxsize = maxsize
+        self.policy = policy
+        self.send_timeout = send_timeout
+        self.on_close = on_close
+        self.closed = False
+
+        # 队列元素: [parts, message]，parts 为 symbol → 记录 JSON 片段；
+        # parts 为 None 的是控制消息 (不丢弃、不合并)
+        self._queue: deque[list] = deque()
+        self._ready = asyncio.Event()
+        self._writer = asyncio.create_task(self._run())
+
+        # 合并模式 (throttle)
+        self.interval = 0.0
+        self.conflator: Conflator | None = None
+        self._flusher: asyncio.Task | None = None
+
+        # 统计
+        self.sent = 0
+        self.dropped = 0
+        self.conflated = 0
+        self.max_depth = 0
+        self._control = 0  # 队列中的控制消息数
+
+    @property
+    def depth(self) -> int:
+        return len(self._queue)
+
+    def enqueue(self, message: str, parts: dict[str, str] | None = None):
+        """
+        入队 (不阻塞)，队列满时按策略处理
+        行情消息需给出 parts (symbol → 该 symbol 记录的 JSON 片段，message 由其拼成)
+        """
+        if self.closed:
+            return
+        if parts is None:
+            if self._control >= MAX_CONTROL_MESSAGES:
+                logger.warning(f"Disconnecting client with {self._control} unsent control messages")
+                self.close(code=1008, reason="Too many pending messages")
+                return
+            self._control += 1
+        elif len(self._queue) >= self.maxsize:
+            if self.policy == "disconnect":
+                logger.warning(f"Disconnecting slow client (queue depth {len(self._queue)})")
+                self.close(code=1013, reason="Client too slow")
+                return
+            if self.policy == "conflate" and self._conflate(parts):
+                self.conflated += 1
+                return
+            self._drop_oldest()
+
+        self._queue.append([parts, message])
+        self.max_depth = max(self.max_depth, len(self._queue))
+        self._ready.set()
+
+    def _conflate(self, parts: dict[str, str]) -> bool:
+        """把新记录按 symbol 合并进已排队的行情帧 (队列中没有行情帧时返回 False)"""
+        remaining = dict(parts)
+        tail = None
+        for item in reversed(self._queue):
+            if item[0] is None:
+                continue
+            if tail is None:
+                tail = item
+            hit = [symbol for symbol in remaining if symbol in item[0]]
+            if hit:
+                # parts 可能被多个客户端共用，修改前复制
+                item[0] = {**item[0], **{symbol: remaining.pop(symbol) for symbol in hit}}
+                item[1] = frame(item[0])
+            if not remaining:
+                return True
+        if tail is None:
+            return False
+        tail[0] = {**tail[0], **remaining}
+        tail[1] = frame(tail[0])
+        return True
+
+    def _drop_oldest(self):
+        for i, item in enumerate(self._queue):
+            if item[0] is not None:
+                del self._queue[i]
+                self.dropped += 1
+                return
+
+    def throttle(self, interval: float, aggregate_trades: bool = True):
+        """每 interval 秒合并发送一次 (interval <= 0 关闭，未发送的合并结果立即入队)"""
+        if self._flusher:
+            self._flusher.cancel()
+            self._flusher = None
+        if self.conflator:
+            self._flush()
+        self.conflator = None
+        self.interval = max(interval, 0.0)
+        if self.interval > 0 and not self.closed:
+            self.conflator = Conflator(aggregate_trades)
+            self._flusher = asyncio.create_task(self._flush_every(self.interval))
+
+    def offer(self, records: Iterable[dict]):
+        """合并模式下加入行情记录 (下一次 flush 时发送)"""
+        if self.conflator is not None and not self.closed:
+            self.conflator.add(records)
+
+    def _flush(self):
+        records = self.conflator.drain()
+        if not records:
+            return
+        by_symbol: dict[str, list[str]] = {}
+        for record in records:
+            symbol = record.get("S", "") if isinstance(record, dict) else ""
+            by_symbol.setdefault(symbol, []).append(json.dumps(record))
+        parts = {symbol: ", ".join(items) for symbol, items in by_symbol.items()}
+        self.enqueue(frame(parts), parts)
+
+    async def _flush_every(self, interval: float):
+        while True:
+            await asyncio.sleep(interval)
+            self._flush()
+
+    async def _run(self):
+        try:
+            while True:
+                await self._ready.wait()
+                while self._queue:
+                    parts, message = self._queue.popleft()
+                    if parts is None:
+                        self._control -= 1
+                    await asyncio.wait_for(self.websocket.send_text(message), self.send_timeout)
+                    self.sent += 1
+                self._ready.clear()
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            # 发送失败或超时 (可能中断在半帧): 连接已不可用，关闭 socket 让处理协程退出并释放订阅
+            logger.info(f"Client send failed ({e!r}), closing")
+            self.close(code=1011, reason="Send failed")
+
+    def close(self, code: int | None = None, reason: str = ""):
+        """停止写协程 (可重复调用)；给出 code 时同时关闭 socket"""
+        if self.closed:
+            return
+        self.closed = True
+        self._queue.clear()
+        self._control = 0
+        if self._flusher:
+            self._flusher.cancel()
+        if self._writer is not asyncio.current_task():
+            self._writer.cancel()
+        if code is not None:
+            self._closing = asyncio.create_task(self._close_socket(code, reason))
+        if self.on_close:
+            self.on_close(self)
+
+    async def _close_socket(self, code: int, reason: str):
+        try:
+            await self.websocket.close(code=code, reason=reason)
+        except Exception:
+            pass
+
+    def stats(self) -> dict:
+        return {
+            "depth": self.depth,
+            "max_depth": self.max_depth,
+            "sent": self.sent,
+            "dropped": self.dropped,
+            "conflated": self.conflated,
+            "throttle_ms": round(self.interval * 1000),
+            **({"conflation": self.conflator.stats()} if self.conflator else {}),
+        }
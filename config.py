@@ -4,6 +4,7 @@
 from pydantic_settings import BaseSettings, SettingsConfigDict
 from functools import lru_cache
 from pathlib import Path
+from typing import Literal
 
 
 # 项目根目录
@@ -33,9 +34,57 @@ class Settings(BaseSettings):
     # RAG
     documents_dir: Path = BASE_DIR / "documents"
     vector_store_dir: Path = BASE_DIR / "data" / "vector_store"
+    embedding_cache_dir: Path = BASE_DIR / "data" / "embedding_cache"  # 按内容哈希缓存的向量
+    embedding_batch_tokens: int = 50_000  # 每个 embedding 请求的 token 上限
+    embedding_max_concurrency: int = 4  # 同时进行的 embedding 请求数
+    embedding_max_retries: int = 3
     chunk_size: int = 1000
     chunk_overlap: int = 200
     
+    # Agent 实例缓存 (按 conversation_id，LRU + 空闲超时)
+    agent_cache_size: int = 256
+    agent_cache_idle_seconds: int = 1800
+    
+    # Market data cache (yfinance)
+    market_data_cache_size: int = 2048  # 最大缓存条目数 (LRU 淘汰)
+    market_data_ttl: dict[str, int] = {  # 各数据集 TTL (秒)
+        "quote": 15,
+        "info": 60,
+        "history": 300,
+        "news": 600,
+        "option_chain": 60,
+        "statements": 6 * 3600,
+        "holders": 6 * 3600,
+        "recommendations": 6 * 3600,
+        "actions": 12 * 3600,
+        "shares": 12 * 3600,
+        "options": 24 * 3600,
+    }
+    
+    # 本地历史行情存储 (OHLCV)
+    history_store_dir: Path = BASE_DIR / "data" / "history"
+    history_refresh_seconds: int = 900  # 距上次同步超过此时间才下载增量
+    
+    # 阻塞调用线程池 (按用途划分)
+    executor_max_workers: dict[str, int] = {"yfinance": 16, "sec": 2, "rag": 4}
+    executor_timeouts: dict[str, float] = {"yfinance": 20.0, "sec": 900.0, "rag": 30.0}  # 单次调用超时 (秒)
+    
+    # Agent 工具输出的 token 预算 (超出后截断行并附带统计摘要)
+    tool_token_budgets: dict[str, int] = {
+        "default": 1500,
+        "get_financials": 2500,
+        "get_option_chain": 2500,
+        "get_holders_info": 2000,
+    }
+    
+    # SEC EDGAR
+    sec_ticker_map_refresh_hours: int = 24  # ticker → CIK 映射的刷新周期
+    sec_filing_check_hours: int = 24  # 此时间内不重新检查是否有新的 10-K
+    sec_max_requests_per_second: float = 8.0  # SEC 公平使用上限为 10 req/s
+    sec_max_retries: int = 3  # 429 / 5xx 重试次数
+    sec_prefetch_enabled: bool = True  # 后台预取自选股的 10-K 并构建索引
+    sec_prefetch_interval_minutes: int = 60
+    
     # Alpaca (Real-time data)
     alpaca_api_key: str | None = None
     alpaca_secret_key: str | None = None
@@ -46,6 +95,15 @@ class Settings(BaseSettings):
     redis_stream_name: str = "stock_quotes"
     redis_consumer_group: str = "quote_consumers"
     
+    # WebSocket 客户端发送队列 (见 client_sender.py)
+    realtime_queue_size: int = 256
+    realtime_overflow_policy: Literal["drop_oldest", "conflate", "disconnect"] = "drop_oldest"
+    realtime_send_timeout: float = 10.0  # 单次发送超时 (秒)，超时视为断开
+    # 行情合并 (见 conflation.py)，0 表示关闭
+    realtime_conflate_ms: int = 0  # 写入 Redis 前按此间隔合并 (全局)
+    realtime_client_throttle_ms: int = 0  # 每个客户端的默认合并间隔，客户端可用 throttle 消息修改
+    realtime_aggregate_trades: bool = True  # 合并时把 trade 汇总为区间成交量
+    
     # Google OAuth
     google_client_id: str | None = None
     google_client_secret: str | None = None
@@ -0,0 +1,67 @@
+"""
+行情合并 (conflation)
+
+高频时段 Alpaca 每个 symbol 每秒会推送大量 quote，而前端只显示最新价。
+Conflator 在一个时间窗口内:
+- quote ("T" == "q"): 每个 symbol 只保留最新一条
+- trade ("T" == "t"): aggregate_trades 时每个 symbol 合并成一条
+  (价格 / 时间取最后一笔，"s" 为窗口内成交量之和，"n" 为成交笔数)；否则原样保留
+- 其他消息 (bar、状态、控制消息等): 原样保留
+drain() 取出窗口内的合并结果并清空。
+"""
+from typing import Iterable
+
+
+class Conflator:
+    def __init__(self, aggregate_trades: bool = True):
+        self.aggregate_trades = aggregate_trades
+        self._passthrough: list = []
+        self._trades: dict[str, dict] = {}
+        self._quotes: dict[str, dict] = {}
+        # 统计
+        self.records_in = 0
+        self.records_out = 0
+
+    def __len__(self) -> int:
+        return len(self._passthrough) + len(self._trades) + len(self._quotes)
+
+    def add(self, records: Iterable):
+        for record in records:
+            self.records_in += 1
+            kind = record.get("T") if isinstance(record, dict) else None
+            symbol = record.get("S") if isinstance(record, dict) else None
+            if symbol is None:
+                self._passthrough.append(record)
+            elif kind == "q":
+                self._quotes[symbol] = record
+            elif kind == "t" and self.aggregate_trades:
+                self._add_trade(symbol, record)
+            else:
+                self._passthrough.append(record)
+
+    def _add_trade(self, symbol: str, record: dict):
+        merged = self._trades.get(symbol)
+        if merged is None:
+            self._trades[symbol] = {**record, "n": 1}
+            return
+        size = merged.get("s", 0) + record.get("s", 0)
+        count = merged["n"] + 1
+        merged.update(record)
+        merged["s"] = size
+        merged["n"] = count
+
+    def drain(self) -> list:
+        """取出当前窗口的合并结果 (没有数据时为空列表)"""
+        records = self._passthrough + list(self._trades.values()) + list(self._quotes.values())
+        self._passthrough = []
+        self._trades = {}
+        self._quotes = {}
+        self.records_out += len(records)
+        return records
+
+    def stats(self) -> dict:
+        return {
+            "records_in": self.records_in,
+            "records_out": self.records_out,
+            "ratio": round(self.records_in / self.records_out, 2) if self.records_out else 0.0,
+        }
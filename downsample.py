@@ -0,0 +1,74 @@
+"""
+图表数据降采样
+
+- lttb: Largest-Triangle-Three-Buckets，保留视觉形状的点降采样 (NumPy 向量化)
+- resample_ohlc: 日线聚合为周线 / 月线 OHLC
+"""
+import numpy as np
+import pandas as pd
+
+# interval → pandas resample 规则
+RESAMPLE_RULES = {
+    "1wk": "W-FRI",
+    "1mo": "MS",
+}
+
+
+def lttb(x: np.ndarray, y: np.ndarray, max_points: int) -> np.ndarray:
+    """
+    Largest-Triangle-Three-Buckets 降采样，返回保留点的下标 (升序)
+
+    首尾两点固定保留，中间的点均分到 max_points - 2 个桶中，
+    每个桶选与 "上一个选中点" 和 "下一个桶均值点" 构成三角形面积最大的点。
+    桶均值、面积计算均为向量化，只有桶间依赖的选点是一次 O(n) 的循环。
+    """
+    n = len(y)
+    if max_points >= n or max_points < 3:
+        return np.arange(n)
+
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+
+    # 中间点 [1, n-1) 的桶边界
+    edges = np.linspace(1, n - 1, max_points - 1).astype(np.int64)
+    starts, ends = edges[:-1], edges[1:]
+
+    # 每个桶的均值点 (用前缀和一次算出)
+    cx = np.concatenate(([0.0], np.cumsum(x)))
+    cy = np.concatenate(([0.0], np.cumsum(y)))
+    counts = ends - starts
+    avg_x = (cx[ends] - cx[starts]) / counts
+    avg_y = (cy[ends] - cy[starts]) / counts
+    # 最后一个桶的 "下一个均值点" 是末尾点
+    next_x = np.append(avg_x[1:], x[-1])
+    next_y = np.append(avg_y[1:], y[-1])
+
+    selected = np.empty(max_points, dtype=np.int64)
+    selected[0] = 0
+    selected[-1] = n - 1
+
+    prev = 0
+    for i, (start, end) in enumerate(zip(starts, ends)):
+        bx = x[start:end]
+        by = y[start:end]
+        area = np.abs(
+            (x[prev] - next_x[i]) * (by - y[prev])
+            - (x[prev] - bx) * (next_y[i] - y[prev])
+        )
+        prev = start + int(np.argmax(area))
+        selected[i + 1] = prev
+
+    return selected
+
+
+def resample_ohlc(history: pd.DataFrame, interval: str) -> pd.DataFrame:
+    """日线聚合为周线 / 月线 (Open 取首、High 取最大、Low 取最小、Close 取末、Volume 求和)"""
+    rule = RESAMPLE_RULES[interval]
+    bars = history.resample(rule).agg({
+        "Open": "first",
+        "High": "max",
+        "Low": "min",
+        "Close": "last",
+        "Volume": "sum",
+    })
+    return bars.dropna(subset=["Close"])
@@ -0,0 +1,147 @@
+"""
+SEC EDGAR HTTP 客户端
+
+- 进程级共享的 httpx.AsyncClient (连接池复用 TCP/TLS 连接)
+- 令牌桶限速，遵守 SEC 10 req/s 的公平使用上限
+- 429 / 5xx / 网络错误时指数退避重试 (优先使用 Retry-After)
+- 所有请求都在一个后台事件循环线程上执行，因此同步调用 (工具在线程中运行)
+  和异步调用共享同一个连接池和同一个限速器
+"""
+import asyncio
+import logging
+import threading
+import time
+
+import httpx
+
+from config import get_settings
+
+logger = logging.getLogger(__name__)
+
+USER_AGENT = "YahooFinanceAgent research@example.com"
+RETRY_STATUS = {429, 500, 502, 503, 504}
+
+
+class TokenBucket:
+    """
+    令牌桶: 平均速率 rate 次/秒，最多突发 capacity 次
+    任意 1 秒内最多 capacity + rate 次，默认 capacity=1 保证不超过 rate + 1
+    """
+
+    def __init__(self, rate: float, capacity: float = 1):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+class EdgarClient:
+    """EDGAR 客户端 (使用 get_edgar_client() 获取进程级单例)"""
+
+    def __init__(self, rate: float, max_retries: int, backoff: float = 0.5):
+        self.rate = rate
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._client: httpx.AsyncClient | None = None
+        self._bucket: TokenBucket | None = None
+        self._start_lock = threading.Lock()
+
+        # 统计
+        self.requests = 0
+        self.retries = 0
+
+    def _ensure_started(self) -> asyncio.AbstractEventLoop:
+        """启动后台事件循环线程 (只启动一次)"""
+        with self._start_lock:
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                thread = threading.Thread(target=loop.run_forever, name="edgar-client", daemon=True)
+                thread.start()
+                self._loop = loop
+            return self._loop
+
+    async def _setup(self):
+        # 必须在后台循环内创建，连接池和锁都绑定到该循环
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                headers={"User-Agent": USER_AGENT},
+                follow_redirects=True,
+                limits=httpx.Limits(max_connections=10, max_keepalive_connections=10),
+            )
+            self._bucket = TokenBucket(self.rate)
+
+    async def _request(self, url: str, headers: dict | None, timeout: float) -> httpx.Response:
+        await self._setup()
+
+        for attempt in range(self.max_retries + 1):
+            await self._bucket.acquire()
+            self.requests += 1
+            last_attempt = attempt == self.max_retries
+
+            try:
+                response = await self._client.get(url, headers=headers, timeout=timeout)
+            except httpx.TransportError as e:
+                if last_attempt:
+                    raise
+                delay = self.backoff * 2 ** attempt
+                logger.warning(f"EDGAR request failed ({e!r}), retrying in {delay:.1f}s: {url}")
+            else:
+                if response.status_code not in RETRY_STATUS or last_attempt:
+                    return response
+                delay = self._retry_after(response) or self.backoff * 2 ** attempt
+                logger.warning(f"EDGAR HTTP {response.status_code}, retrying in {delay:.1f}s: {url}")
+
+            self.retries += 1
+            await asyncio.sleep(delay)
+
+    @staticmethod
+    def _retry_after(response: httpx.Response) -> float | None:
+        value = response.headers.get("Retry-After")
+        try:
+            return float(value) if value else None
+        except ValueError:
+            return None
+
+    async def aget(self, url: str, headers: dict | None = None, timeout: float = 30) -> httpx.Response:
+        """异步 GET (可在任意事件循环中 await)"""
+        loop = self._ensure_started()
+        future = asyncio.run_coroutine_threadsafe(self._request(url, headers, timeout), loop)
+        return await asyncio.wrap_future(future)
+
+    def get(self, url: str, headers: dict | None = None, timeout: float = 30) -> httpx.Response:
+        """同步 GET (供同步工具调用，不能在事件循环线程中使用)"""
+        loop = self._ensure_started()
+        return asyncio.run_coroutine_threadsafe(self._request(url, headers, timeout), loop).result()
+
+    def stats(self) -> dict:
+        return {"rate_limit": self.rate, "requests": self.requests, "retries": self.retries}
+
+
+_client: EdgarClient | None = None
+_client_lock = threading.Lock()
+
+
+def get_edgar_client() -> EdgarClient:
+    """进程级共享的 EDGAR 客户端"""
+    global _client
+    with _client_lock:
+        if _client is None:
+            settings = get_settings()
+            _client = EdgarClient(
+                rate=settings.sec_max_requests_per_second,
+                max_retries=settings.sec_max_retries,
+            )
+        return _client
@@ -0,0 +1,180 @@
+"""
+批量 + 并发 Embedding
+
+构建大索引时，按 token 数把分块分成若干批，多个批次并发请求 (有上限)，
+失败的批次指数退避重试，并记录进度。同步调用使用线程池，异步调用使用协程。
+"""
+import asyncio
+import itertools
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from langchain_core.embeddings import Embeddings
+
+logger = logging.getLogger(__name__)
+
+# 粗略的 token 估算 (英文约 4 字符 / token，避免加载 tokenizer)
+CHARS_PER_TOKEN = 4
+# OpenAI 单次请求最多 2048 条输入
+MAX_BATCH_SIZE = 2048
+
+
+def estimate_tokens(text: str) -> int:
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+class BatchedEmbeddings(Embeddings):
+    """把 embed_documents 拆成按 token 数划分的批次并发执行 (查询直接透传)"""
+
+    def __init__(
+        self,
+        underlying: Embeddings,
+        batch_tokens: int,
+        max_concurrency: int,
+        max_retries: int,
+        backoff: float = 1.0,
+    ):
+        self.underlying = underlying
+        self.batch_tokens = batch_tokens
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.backoff = backoff
+
+        # 进度 / 统计
+        self.jobs: dict[int, dict] = {}  # 进行中的任务
+        self._job_ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self.batches = 0
+        self.retries = 0
+        self.texts = 0
+
+    def make_batches(self, texts: list[str]) -> list[list[str]]:
+        """按 token 预算顺序切分 (单条超预算的文本独占一批)"""
+        batches = []
+        start, tokens = 0, 0
+        for i, text in enumerate(texts):
+            cost = estimate_tokens(text)
+            if i > start and (tokens + cost > self.batch_tokens or i - start >= MAX_BATCH_SIZE):
+                batches.append(texts[start:i])
+                start, tokens = i, 0
+            tokens += cost
+        if start < len(texts):
+            batches.append(texts[start:])
+        return batches
+
+    def _start_job(self, texts: list[str], batches: list) -> int:
+        job_id = next(self._job_ids)
+        with self._lock:
+            self.jobs[job_id] = {
+                "texts_total": len(texts),
+                "texts_done": 0,
+                "batches_total": len(batches),
+                "batches_done": 0,
+                "started_at": time.time(),
+            }
+        return job_id
+
+    def _batch_done(self, job_id: int, size: int):
+        with self._lock:
+            self.batches += 1
+            self.texts += size
+            job = self.jobs.get(job_id)
+            if job is None:  # 任务已因其他批次失败而结束
+                return
+            job["texts_done"] += size
+            job["batches_done"] += 1
+            progress = f"{job['batches_done']}/{job['batches_total']} batches ({job['texts_done']}/{job['texts_total']} chunks)"
+        logger.info(f"🧮 Embedded {progress}")
+
+    def _finish_job(self, job_id: int):
+        with self._lock:
+            self.jobs.pop(job_id, None)
+
+    def _retry_delay(self, attempt: int, error: Exception) -> float:
+        with self._lock:
+            self.retries += 1
+        delay = self.backoff * 2 ** attempt
+        logger.warning(f"Embedding batch failed ({error!r}), retrying in {delay:.1f}s")
+        return delay
+
+    def _embed_batch(self, job_id: int, texts: list[str]) -> list[list[float]]:
+        for attempt in range(self.max_retries + 1):
+            try:
+                vectors = self.underlying.embed_documents(texts)
+                break
+            except Exception as e:
+                if attempt == self.max_retries:
+                    raise
+                time.sleep(self._retry_delay(attempt, e))
+        self._batch_done(job_id, len(texts))
+        return vectors
+
+    async def _aembed_batch(self, job_id: int, texts: list[str], semaphore: asyncio.Semaphore) -> list[list[float]]:
+        async with semaphore:
+            for attempt in range(self.max_retries + 1):
+                try:
+                    vectors = await self.underlying.aembed_documents(texts)
+                    break
+                except Exception as e:
+                    if attempt == self.max_retries:
+                        raise
+                    await asyncio.sleep(self._retry_delay(attempt, e))
+        self._batch_done(job_id, len(texts))
+        return vectors
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        batches = self.make_batches(texts)
+        if not batches:
+            return []
+
+        job_id = self._start_job(texts, batches)
+        try:
+            if len(batches) == 1:
+                # 增量更新通常只有一批: 同样需要重试和进度
+                return self._embed_batch(job_id, batches[0])
+            pool = ThreadPoolExecutor(max_workers=min(self.max_concurrency, len(batches)), thread_name_prefix="embed")
+            try:
+                results = list(pool.map(lambda batch: self._embed_batch(job_id, batch), batches))
+            finally:
+                # 某一批最终失败时，不再启动排队中的批次
+                pool.shutdown(wait=False, cancel_futures=True)
+            return [vector for vectors in results for vector in vectors]
+        finally:
+            self._finish_job(job_id)
+
+    async def aembed_documents(self, texts: list[str]) -> list[list[float]]:
+        batches = self.make_batches(texts)
+        if not batches:
+            return []
+
+        job_id = self._start_job(texts, batches)
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        tasks = [asyncio.ensure_future(self._aembed_batch(job_id, batch, semaphore)) for batch in batches]
+        try:
+            results = await asyncio.gather(*tasks)
+            return [vector for vectors in results for vector in vectors]
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            raise
+        finally:
+            self._finish_job(job_id)
+
+    def embed_query(self, text: str) -> list[float]:
+        return self.underlying.embed_query(text)
+
+    async def aembed_query(self, text: str) -> list[float]:
+        return await self.underlying.aembed_query(text)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "batch_tokens": self.batch_tokens,
+                "max_concurrency": self.max_concurrency,
+                "batches": self.batches,
+                "texts": self.texts,
+                "retries": self.retries,
+                "in_progress": list(self.jobs.values()),
+            }
@@ -0,0 +1,224 @@
+"""
+Embedding 持久缓存 (按内容哈希寻址)
+
+key = sha256(模型名 + 文本)，同一段文本在同一模型下只向 API 请求一次。
+每个模型一个目录:
+- vectors.f32: 所有向量按行追加的 float32 原始数组 (读取时内存映射)
+- keys.txt:    与 vectors.f32 逐行对应的 key (十六进制)，加载时建立 key → 行号 索引
+- meta.json:   模型名和向量维度
+
+先写向量、后写 key，进程中断时多出的半行向量在下次加载时截掉。
+多个进程可以共用同一目录: 追加在文件锁 (fcntl.flock) 内进行，
+行号以文件中的 key 数为准；查询前先读入其他进程新追加的 key。
+"""
+import hashlib
+import json
+import logging
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+
+try:
+    import fcntl
+except ImportError:  # Windows: 只有进程内锁
+    fcntl = None
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+logger = logging.getLogger(__name__)
+
+
+def content_key(model: str, text: str) -> str:
+    return hashlib.sha256(f"{model}\0{text}".encode("utf-8")).hexdigest()
+
+
+class EmbeddingStore:
+    """单个模型的向量文件 + 行号索引 (线程安全)"""
+
+    def __init__(self, directory: Path, model: str):
+        self.directory = Path(directory)
+        self.model = model
+        self.dim: int | None = None
+        self._rows: dict[str, int] = {}
+        self._keys_read = 0  # keys.txt 中已读入的字节数
+        self._vectors: np.ndarray | None = None  # 当前映射的向量 (可能落后于 _rows)
+        self._lock = threading.Lock()
+        if self._meta_file.exists():
+            with self._file_lock():
+                self._load()
+
+    @property
+    def _vector_file(self) -> Path:
+        return self.directory / "vectors.f32"
+
+    @property
+    def _key_file(self) -> Path:
+        return self.directory / "keys.txt"
+
+    @property
+    def _meta_file(self) -> Path:
+        return self.directory / "meta.json"
+
+    @contextmanager
+    def _file_lock(self):
+        """跨进程排他锁 (保护追加和崩溃修复)"""
+        self.directory.mkdir(parents=True, exist_ok=True)
+        with open(self.directory / ".lock", "a") as f:
+            if fcntl:
+                fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl:
+                    fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _read_dim(self) -> bool:
+        try:
+            self.dim = json.loads(self._meta_file.read_text(encoding="utf-8"))["dim"]
+            return True
+        except (FileNotFoundError, ValueError):
+            return False
+
+    def _load(self):
+        """加载并修复中断的写入 (需持有文件锁)"""
+        if not self._read_dim():
+            return
+
+        keys = self._key_file.read_text(encoding="utf-8").split() if self._key_file.exists() else []
+        row_bytes = self.dim * 4
+        size = self._vector_file.stat().st_size if self._vector_file.exists() else 0
+        rows = min(len(keys), size // row_bytes)
+        if size != rows * row_bytes:
+            # 上次写入中断: 截掉没有对应 key 的向量
+            with open(self._vector_file, "r+b") as f:
+                f.truncate(rows * row_bytes)
+        if len(keys) > rows:
+            self._key_file.write_text("".join(f"{k}\n" for k in keys[:rows]), encoding="utf-8")
+
+        self._rows = {key: i for i, key in enumerate(keys[:rows])}
+        self._keys_read = self._key_file.stat().st_size if self._key_file.exists() else 0
+        logger.info(f"📦 Embedding cache for {self.model}: {rows:,} vectors")
+
+    def _refresh(self):
+        """读入其他进程追加的 key (只读完整的行；向量总是先于 key 写入)"""
+        try:
+            size = self._key_file.stat().st_size
+        except FileNotFoundError:
+            return
+        if size <= self._keys_read:
+            return
+        if self.dim is None and not self._read_dim():
+            return
+        with open(self._key_file, "rb") as f:
+            f.seek(self._keys_read)
+            chunk = f.read(size - self._keys_read)
+        complete = chunk[:chunk.rfind(b"\n") + 1]
+        for key in complete.decode("utf-8").split():
+            self._rows[key] = len(self._rows)
+        self._keys_read += len(complete)
+
+    def _mapped(self) -> np.ndarray:
+        if self._vectors is None or len(self._vectors) < len(self._rows):
+            self._vectors = np.memmap(self._vector_file, dtype=np.float32, mode="r").reshape(-1, self.dim)
+        return self._vectors
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def get_many(self, keys: list[str]) -> dict[str, np.ndarray]:
+        """命中的 key → 向量"""
+        with self._lock:
+            self._refresh()
+            rows = {key: self._rows[key] for key in keys if key in self._rows}
+            if not rows:
+                return {}
+            vectors = self._mapped()
+            return {key: np.array(vectors[row]) for key, row in rows.items()}
+
+    def put_many(self, items: dict[str, list[float]]):
+        with self._lock:
+            if not items:
+                return
+            with self._file_lock():
+                # 先同步其他进程写入的 key，新行号从文件中的实际行数开始
+                self._refresh()
+                items = {k: v for k, v in items.items() if k not in self._rows}
+                if not items:
+                    return
+                matrix = np.asarray(list(items.values()), dtype=np.float32)
+                if self.dim is None and not self._read_dim():
+                    self.dim = matrix.shape[1]
+                    self._meta_file.write_text(json.dumps({"model": self.model, "dim": self.dim}), encoding="utf-8")
+
+                start = len(self._rows)
+                row_bytes = self.dim * 4
+                with open(self._vector_file, "ab") as f:
+                    if f.tell() != start * row_bytes:
+                        # 其他进程中断时留下的多余向量
+                        f.truncate(start * row_bytes)
+                    f.write(matrix.tobytes())
+                with open(self._key_file, "a", encoding="utf-8") as f:
+                    f.write("".join(f"{k}\n" for k in items))
+
+                for i, key in enumerate(items):
+                    self._rows[key] = start + i
+                self._keys_read = self._key_file.stat().st_size
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    在真实 Embeddings 前加一层内容哈希缓存 (只缓存文档，查询直接透传)
+    未命中的文本去重后一次性请求
+    """
+
+    def __init__(self, underlying: Embeddings, model: str, cache_dir: Path):
+        self.underlying = underlying
+        self.model = model
+        self.store = EmbeddingStore(Path(cache_dir) / model.replace("/", "_"), model)
+        self.hits = 0
+        self.misses = 0
+
+    def _lookup(self, texts: list[str]) -> tuple[list[str], dict[str, np.ndarray], list[str]]:
+        keys = [content_key(self.model, text) for text in texts]
+        found = self.store.get_many(keys)
+        # 未命中的文本 (同一批次内去重)
+        missing = {key: text for key, text in zip(keys, texts) if key not in found}
+        self.hits += len(texts) - sum(1 for key in keys if key not in found)
+        self.misses += len(missing)
+        return keys, found, list(missing.items())
+
+    def _merge(self, keys, found, missing, vectors) -> list[list[float]]:
+        fresh = {key: vector for (key, _), vector in zip(missing, vectors)}
+        self.store.put_many(fresh)
+        return [fresh[key] if key in fresh else found[key].tolist() for key in keys]
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        keys, found, missing = self._lookup(texts)
+        vectors = self.underlying.embed_documents([text for _, text in missing]) if missing else []
+        return self._merge(keys, found, missing, vectors)
+
+    async def aembed_documents(self, texts: list[str]) -> list[list[float]]:
+        keys, found, missing = self._lookup(texts)
+        vectors = await self.underlying.aembed_documents([text for _, text in missing]) if missing else []
+        return self._merge(keys, found, missing, vectors)
+
+    def embed_query(self, text: str) -> list[float]:
+        return self.underlying.embed_query(text)
+
+    async def aembed_query(self, text: str) -> list[float]:
+        return await self.underlying.aembed_query(text)
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        stats = {
+            "model": self.model,
+            "vectors": len(self.store),
+            "dim": self.store.dim,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+        }
+        if hasattr(self.underlying, "stats"):
+            stats["requests"] = self.underlying.stats()
+        return stats
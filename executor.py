@@ -0,0 +1,134 @@
+"""
+阻塞调用的专用线程池
+
+yfinance 等同步 IO 不能直接在 async 路由中调用，否则会卡住整个事件循环
+(包括实时行情 WebSocket)。这里按用途提供有界线程池，带超时和队列深度统计。
+"""
+import asyncio
+import logging
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable
+
+from config import get_settings
+
+logger = logging.getLogger(__name__)
+
+# 未在配置中出现的线程池使用的默认值
+DEFAULT_MAX_WORKERS = 8
+DEFAULT_TIMEOUT = 30.0
+
+_USE_DEFAULT = object()
+
+
+class BoundedExecutor:
+    """固定大小的线程池，提供 async 接口、单次调用超时和运行统计"""
+
+    def __init__(self, name: str, max_workers: int, timeout: float | None):
+        self.name = name
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=name)
+        self._lock = threading.Lock()
+
+        # 统计
+        self.queued = 0           # 已提交、等待线程的任务数
+        self.active = 0           # 正在执行的任务数
+        self.max_queue_depth = 0  # 历史最大排队数
+        self.completed = 0
+        self.failed = 0
+        self.timeouts = 0
+
+    def _invoke(self, fn: Callable, args: tuple, kwargs: dict) -> Any:
+        with self._lock:
+            self.queued -= 1
+            self.active += 1
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            with self._lock:
+                self.active -= 1
+
+    def _on_done(self, future: Future):
+        # 排队中被取消的任务不会进入 _invoke，需要在这里扣减
+        if future.cancelled():
+            with self._lock:
+                self.queued -= 1
+
+    async def run(self, fn: Callable, *args, timeout: Any = _USE_DEFAULT, **kwargs) -> Any:
+        """
+        在线程池中执行 fn(*args, **kwargs) 并等待结果。
+        超时抛出 asyncio.TimeoutError (排队中的任务会被取消，执行中的任务无法中断)。
+        """
+        if timeout is _USE_DEFAULT:
+            timeout = self.timeout
+
+        with self._lock:
+            self.queued += 1
+            self.max_queue_depth = max(self.max_queue_depth, self.queued)
+
+        future = self._pool.submit(self._invoke, fn, args, kwargs)
+        future.add_done_callback(self._on_done)
+
+        try:
+            result = await asyncio.wait_for(asyncio.wrap_future(future), timeout)
+        except asyncio.TimeoutError:
+            with self._lock:
+                self.timeouts += 1
+            logger.warning(f"[{self.name}] {getattr(fn, '__name__', fn)} timed out after {timeout}s")
+            raise
+        except Exception:
+            with self._lock:
+                self.failed += 1
+            raise
+
+        with self._lock:
+            self.completed += 1
+        return result
+
+    def stats(self) -> dict:
+        """队列深度 / 运行状态"""
+        return {
+            "max_workers": self.max_workers,
+            "timeout": self.timeout,
+            "queued": self.queued,
+            "active": self.active,
+            "max_queue_depth": self.max_queue_depth,
+            "completed": self.completed,
+            "failed": self.failed,
+            "timeouts": self.timeouts,
+        }
+
+    def shutdown(self):
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+
+# 线程池实例缓存 (按名称)
+_executors: dict[str, BoundedExecutor] = {}
+_executors_lock = threading.Lock()
+
+
+def get_executor(name: str) -> BoundedExecutor:
+    """获取或创建指定名称的线程池，大小和超时来自 Settings"""
+    with _executors_lock:
+        if name not in _executors:
+            settings = get_settings()
+            _executors[name] = BoundedExecutor(
+                name,
+                max_workers=settings.executor_max_workers.get(name, DEFAULT_MAX_WORKERS),
+                timeout=settings.executor_timeouts.get(name, DEFAULT_TIMEOUT),
+            )
+        return _executors[name]
+
+
+def executor_stats() -> dict:
+    """所有线程池的统计"""
+    return {name: executor.stats() for name, executor in _executors.items()}
+
+
+def shutdown_executors():
+    """关闭所有线程池"""
+    with _executors_lock:
+        for executor in _executors.values():
+            executor.shutdown()
+        _executors.clear()
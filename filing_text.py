@@ -0,0 +1,155 @@
+"""
+SEC 10-K (inline XBRL) HTML 转纯文本
+
+- html_to_text: lxml 流式解析 (target 解析器，不建树)，一次遍历完成
+  XBRL 剥离、行清洗、空行合并；未安装 lxml 时退回 BeautifulSoup
+- html_to_text_bs4: 原 BeautifulSoup 实现 (作为退路和基准对照)
+
+两条路径输出格式一致: 每个文本节点独占一行，段落间保留一个空行，
+开头的 XBRL 元数据行被跳过。
+"""
+import re
+
+try:
+    from lxml import etree
+except ImportError:  # lxml 为可选依赖
+    etree = None
+
+# 整体丢弃的标签 (内容不要，尾随文本保留)
+SKIP_TAGS = {"script", "style", "ix:nonfraction", "ix:nonnumeric", "ix:header", "ix:hidden"}
+
+_METADATA_LINE = re.compile(r"^[\w-]+:[\w-]+$|^\d{4}-\d{2}-\d{2}$|^\d{10}$")
+_SPACES = re.compile(r"[ \t]+")
+
+
+class _LineNormalizer:
+    """逐行清洗: 去首尾空白、跳过开头元数据、合并连续空行和行内空格"""
+
+    def __init__(self):
+        self.lines: list[str] = []
+        self._in_header = True
+        self._blank = False
+
+    def add(self, line: str):
+        line = line.strip()
+        if self._in_header:
+            if _METADATA_LINE.match(line):
+                return
+            if not (line and not line.startswith("0001") and len(line) > 20):
+                return
+            self._in_header = False
+
+        if not line:
+            self._blank = True
+            return
+        if self._blank:
+            self.lines.append("")
+            self._blank = False
+        self.lines.append(_SPACES.sub(" ", line))
+
+    def text(self) -> str:
+        return "\n".join(self.lines)
+
+
+class _TextTarget:
+    """lxml 解析器回调: 按文档顺序收集文本节点，跳过 SKIP_TAGS 子树"""
+
+    def __init__(self):
+        self.normalizer = _LineNormalizer()
+        self._skip_depth = 0
+        self._buffer: list[str] = []
+
+    def _flush(self):
+        # 一个文本节点可能分多次回调，节点边界即换行
+        if self._buffer:
+            for line in "".join(self._buffer).split("\n"):
+                self.normalizer.add(line)
+            self._buffer.clear()
+
+    def start(self, tag, attrib):
+        self._flush()
+        if self._skip_depth or tag in SKIP_TAGS:
+            self._skip_depth += 1
+
+    def end(self, tag):
+        self._flush()
+        if self._skip_depth:
+            self._skip_depth -= 1
+
+    def data(self, data):
+        if not self._skip_depth:
+            self._buffer.append(data)
+
+    def comment(self, text):
+        self._flush()
+
+    def pi(self, target, data=None):
+        self._flush()
+
+    def close(self) -> str:
+        self._flush()
+        return self.normalizer.text()
+
+
+def _detect_encoding(content: bytes) -> str:
+    # EDGAR 文件绝大多数是 ASCII/UTF-8，少数老文件是 Windows-1252
+    try:
+        content.decode("utf-8")
+        return "utf-8"
+    except UnicodeDecodeError:
+        return "windows-1252"
+
+
+def html_to_text_lxml(content: bytes) -> str:
+    """lxml 流式路径"""
+    parser = etree.HTMLParser(
+        target=_TextTarget(),
+        encoding=_detect_encoding(content),
+        recover=True,
+        no_network=True,
+    )
+    parser.feed(content)
+    return parser.close()
+
+
+def html_to_text_bs4(content: bytes) -> str:
+    """BeautifulSoup 路径 (原实现)"""
+    from bs4 import BeautifulSoup
+    soup = BeautifulSoup(content, 'html.parser')
+
+    # Remove scripts, styles, and XBRL inline tags
+    for tag in soup(list(SKIP_TAGS)):
+        tag.decompose()
+
+    # Remove all ix: namespace tags but keep their text content
+    for tag in soup.find_all(re.compile(r'^ix:')):
+        tag.unwrap()
+
+    text = soup.get_text(separator='\n')
+
+    # Clean up XBRL metadata at the beginning (lines with : that look like metadata)
+    lines = text.split('\n')
+    clean_lines = []
+    skip_header = True
+    for line in lines:
+        line = line.strip()
+        # Skip XBRL-like metadata lines at the beginning
+        if skip_header:
+            if re.match(r'^[\w-]+:[\w-]+$', line) or re.match(r'^\d{4}-\d{2}-\d{2}$', line) or re.match(r'^\d{10}$', line):
+                continue
+            if line and not line.startswith('0001') and len(line) > 20:
+                skip_header = False
+        if not skip_header:
+            clean_lines.append(line)
+
+    text = '\n'.join(clean_lines)
+    text = re.sub(r'\n\s*\n', '\n\n', text)  # Preserve paragraph structure
+    text = re.sub(r'[ \t]+', ' ', text)
+    return text
+
+
+def html_to_text(content: bytes) -> str:
+    """10-K HTML 转纯文本 (优先 lxml)"""
+    if etree is not None:
+        return html_to_text_lxml(content)
+    return html_to_text_bs4(content)
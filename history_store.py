@@ -0,0 +1,255 @@
+"""
+本地 OHLCV 历史行情存储 (按列存储的 .npy 文件，memory-mapped 读取)
+
+data/history/{TICKER}/
+    meta.json                 当前版本、列名、时区、覆盖起始日期、最后同步时间
+    v{N}-{id}/index.npy       K 线时间 (int64, UTC 纳秒)
+    v{N}-{id}/close.npy ...   每列一个文件
+
+- 首次请求某个 period 时完整下载
+- 之后只下载最后一根 K 线之后的增量 (包含最后一根，盘中 K 线会变化)
+- history_refresh_seconds 内的请求完全不访问网络
+- 新版本先写入临时目录，改名为版本目录后再原子替换 meta.json，读者不会看到写了一半的数据
+- 版本目录和临时文件名带随机后缀，多个进程同时写同一 ticker 也不会写到同一个文件
+"""
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+import uuid
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import yfinance as yf
+
+from config import get_settings
+
+logger = logging.getLogger(__name__)
+
+# period → 日历偏移 (按交易日计的 "Nd" 单独处理)
+PERIOD_OFFSETS = {
+    "1mo": pd.DateOffset(months=1),
+    "3mo": pd.DateOffset(months=3),
+    "6mo": pd.DateOffset(months=6),
+    "1y": pd.DateOffset(years=1),
+    "2y": pd.DateOffset(years=2),
+    "5y": pd.DateOffset(years=5),
+    "10y": pd.DateOffset(years=10),
+}
+PERIOD_BARS = {"1d": 1, "5d": 5}
+
+# 崩溃遗留的临时目录超过此时间 (秒) 后清理
+STALE_TMP_SECONDS = 3600
+
+# 每个 ticker 一把锁，避免同一进程内并发写同一目录
+_locks: dict[str, threading.Lock] = {}
+_locks_guard = threading.Lock()
+
+
+def _ticker_lock(ticker: str) -> threading.Lock:
+    with _locks_guard:
+        return _locks.setdefault(ticker, threading.Lock())
+
+
+def _ticker_dir(ticker: str) -> Path:
+    return get_settings().history_store_dir / ticker
+
+
+def _column_file(column: str) -> str:
+    return column.lower().replace(" ", "_") + ".npy"
+
+
+def _period_start(period: str, tz) -> pd.Timestamp | None:
+    """period 对应的起始时间，max 返回 None"""
+    today = pd.Timestamp.now(tz=tz).normalize()
+    if period == "max":
+        return None
+    if period == "ytd":
+        return today.replace(month=1, day=1)
+    if period in PERIOD_BARS:
+        # 按交易日取最后 N 根 K 线，覆盖范围多留一周余量 (周末/节假日)
+        return today - pd.Timedelta(days=PERIOD_BARS[period] + 7)
+    return today - PERIOD_OFFSETS[period]
+
+
+def _read_meta(ticker_dir: Path) -> dict | None:
+    try:
+        return json.loads((ticker_dir / "meta.json").read_text())
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+def _read_frame(ticker_dir: Path, meta: dict, start: pd.Timestamp | None = None) -> pd.DataFrame:
+    """从磁盘读取 (memory-mapped)，只复制 start 之后的部分"""
+    version_dir = ticker_dir / meta["version"]
+    index = np.load(version_dir / "index.npy", mmap_mode="r")
+
+    offset = 0
+    if start is not None:
+        offset = int(np.searchsorted(index, start.tz_convert("UTC").value))
+
+    data = {
+        column: np.array(np.load(version_dir / _column_file(column), mmap_mode="r")[offset:])
+        for column in meta["columns"]
+    }
+    dates = pd.to_datetime(np.array(index[offset:]), utc=True)
+    if meta.get("tz"):
+        dates = dates.tz_convert(meta["tz"])
+    else:
+        dates = dates.tz_localize(None)
+    return pd.DataFrame(data, index=pd.DatetimeIndex(dates, name="Date"))
+
+
+def _write_meta(ticker_dir: Path, meta: dict):
+    tmp = ticker_dir / f"meta.json.tmp-{uuid.uuid4().hex[:8]}"
+    tmp.write_text(json.dumps(meta))
+    os.replace(tmp, ticker_dir / "meta.json")
+
+
+def _version_number(version: str) -> int:
+    """v{N} 或 v{N}-{id} → N"""
+    return int(version[1:].split("-")[0])
+
+
+def _cleanup(ticker_dir: Path, previous: str | None):
+    """
+    删除比上一个版本更早的版本 (上一个版本可能仍有读者在 mmap)。
+    编号不小于上一个版本的目录可能是其他进程刚写好的，保留到下次写入。
+    """
+    floor = _version_number(previous) if previous else 0
+    for path in ticker_dir.glob("v*"):
+        if path.is_dir() and _version_number(path.name) < floor:
+            shutil.rmtree(path, ignore_errors=True)
+    for path in ticker_dir.glob(".tmp-*"):
+        try:
+            if time.time() - path.stat().st_mtime > STALE_TMP_SECONDS:
+                shutil.rmtree(path, ignore_errors=True)
+        except OSError:
+            pass
+
+
+def _write_frame(ticker_dir: Path, df: pd.DataFrame, meta: dict | None, covered_from: str) -> dict:
+    """写入临时目录，改名为新版本目录，然后原子替换 meta.json"""
+    previous = meta["version"] if meta else None
+    suffix = uuid.uuid4().hex[:8]
+    version = f"v{_version_number(previous) + 1 if previous else 1}-{suffix}"
+    version_dir = ticker_dir / f".tmp-{suffix}"
+    version_dir.mkdir(parents=True, exist_ok=True)
+
+    index = df.index
+    tz = str(index.tz) if index.tz is not None else None
+    utc_index = index.tz_convert("UTC") if tz else index
+    np.save(version_dir / "index.npy", utc_index.as_unit("ns").asi8.astype(np.int64))
+
+    columns = list(df.columns)
+    for column in columns:
+        np.save(version_dir / _column_file(column), df[column].to_numpy(dtype=np.float64))
+    os.rename(version_dir, ticker_dir / version)
+
+    new_meta = {
+        "version": version,
+        "columns": columns,
+        "tz": tz,
+        "covered_from": covered_from,
+        "last_sync": time.time(),
+    }
+    _write_meta(ticker_dir, new_meta)
+    _cleanup(ticker_dir, previous)
+    return new_meta
+
+
+def _download(ticker: str, period: str | None = None, start: str | None = None) -> pd.DataFrame:
+    stock = yf.Ticker(ticker)
+    if start is not None:
+        return stock.history(start=start)
+    return stock.history(period=period)
+
+
+def _covers(meta: dict, start: pd.Timestamp | None) -> bool:
+    """本地数据是否覆盖请求的起始时间"""
+    covered_from = meta["covered_from"]
+    if covered_from == "max":
+        return True
+    if start is None:
+        return False
+    return pd.Timestamp(covered_from) <= start.tz_localize(None)
+
+
+def _has_new_adjustment(stored: pd.DataFrame, tail: pd.DataFrame) -> bool:
+    """增量中是否出现新的分红/拆股 (会改变所有历史复权价格)"""
+    for column in ("Dividends", "Stock Splits"):
+        if column not in tail.columns or column not in stored.columns:
+            continue
+        new = tail[column].fillna(0)
+        old = stored[column].reindex(tail.index).fillna(0)
+        if ((new != 0) & (new != old)).any():
+            return True
+    return False
+
+
+def _sync(ticker: str, ticker_dir: Path, meta: dict | None, period: str, start) -> dict | None:
+    """按需从 Yahoo 下载: 缺失区间完整下载，过期数据只下载尾部增量"""
+    settings = get_settings()
+
+    if meta is None or not _covers(meta, start):
+        # 首次请求或需要更早的数据: 完整下载请求的 period
+        df = _download(ticker, period=period)
+        if df.empty:
+            return meta
+        covered_from = "max" if start is None else str(start.tz_localize(None).date())
+        logger.info(f"📥 Stored {len(df)} bars for {ticker} (from {covered_from})")
+        return _write_frame(ticker_dir, df, meta, covered_from)
+
+    if time.time() - meta["last_sync"] < settings.history_refresh_seconds:
+        return meta
+
+    stored = _read_frame(ticker_dir, meta)
+    last_bar = stored.index[-1]
+    tail = _download(ticker, start=str(last_bar.date()))
+    if tail.empty:
+        meta["last_sync"] = time.time()
+        _write_meta(ticker_dir, meta)
+        return meta
+
+    if _has_new_adjustment(stored, tail):
+        # 复权价格整体变化，重新下载整个覆盖区间
+        covered_from = meta["covered_from"]
+        logger.info(f"🔄 Dividend/split detected for {ticker}, re-downloading history")
+        if covered_from == "max":
+            df = _download(ticker, period="max")
+        else:
+            df = _download(ticker, start=covered_from)
+        if df.empty:
+            # 保留旧版本 (复权前的价格)，last_sync 不变，下次请求重试
+            logger.error(f"Re-download after dividend/split returned no data for {ticker}, keeping {meta['version']}")
+            return meta
+        return _write_frame(ticker_dir, df, meta, covered_from)
+
+    tail = tail.reindex(columns=stored.columns)
+    merged = pd.concat([stored[stored.index < tail.index[0]], tail])
+    return _write_frame(ticker_dir, merged, meta, meta["covered_from"])
+
+
+def get_history(ticker: str, period: str = "1mo") -> pd.DataFrame:
+    """
+    获取日线历史行情，优先从本地存储读取
+    返回与 Ticker.history(period=...) 相同结构的 DataFrame
+    """
+    ticker = ticker.upper()
+    ticker_dir = _ticker_dir(ticker)
+
+    with _ticker_lock(ticker):
+        meta = _read_meta(ticker_dir)
+        tz = meta.get("tz") if meta else None
+        start = _period_start(period, tz or "America/New_York")
+        meta = _sync(ticker, ticker_dir, meta, period, start)
+        if meta is None:
+            return pd.DataFrame()
+        df = _read_frame(ticker_dir, meta, start)
+
+    if period in PERIOD_BARS:
+        df = df.iloc[-PERIOD_BARS[period]:]
+    return df
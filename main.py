@@ -17,6 +17,8 @@ from fastapi.responses import FileResponse
 
 from config import get_settings
 from database import init_db
+from executor import shutdown_executors
+from sec_prefetch import get_sec_prefetcher
 from routes import chat, rag, stock, realtime, auth, watchlist
 
 # 静态文件目录
@@ -54,10 +56,16 @@ async def lifespan(app: FastAPI):
     await init_db()
     logger.info("Database initialized")
     
+    # 后台预取自选股的 10-K
+    if settings.sec_prefetch_enabled:
+        get_sec_prefetcher().start()
+    
     yield
     
     # Shutdown
     logger.info("Shutting down QuantBrains API...")
+    await get_sec_prefetcher().stop()
+    shutdown_executors()
 
 
 settings = get_settings()
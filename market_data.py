@@ -0,0 +1,285 @@
+"""
+市场数据访问层 - 所有 yfinance 调用的统一入口
+
+LangChain 工具 (tools/) 和 REST 路由 (routes/stock.py) 都通过这里取数，
+同一 ticker 的同一数据集在 TTL 内只请求一次 Yahoo Finance，
+并发的相同请求会被合并成一次网络调用 (single-flight)。
+TTL 按数据集配置 (见 Settings.market_data_ttl)。
+"""
+import logging
+import math
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, TypeVar
+
+import yfinance as yf
+
+import history_store
+from cache import TTLCache, SingleFlight, MISSING
+from config import get_settings
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# 未在配置中出现的数据集使用的默认 TTL (秒)
+DEFAULT_TTL = 60
+
+_cache: TTLCache | None = None
+_cache_lock = threading.Lock()
+_singleflight = SingleFlight()
+
+
+def _get_cache() -> TTLCache:
+    """获取进程级缓存 (懒加载，工具在线程中并发调用，只创建一次)"""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                settings = get_settings()
+                _cache = TTLCache(maxsize=settings.market_data_cache_size, ttl=DEFAULT_TTL)
+    return _cache
+
+
+def _ttl(dataset: str) -> float:
+    return get_settings().market_data_ttl.get(dataset, DEFAULT_TTL)
+
+
+def _is_empty(value: Any) -> bool:
+    """空结果不缓存 (通常是 ticker 无效或 Yahoo 限流)"""
+    if value is None:
+        return True
+    if getattr(value, "empty", False):  # DataFrame / Series
+        return True
+    if isinstance(value, (dict, list, tuple)) and not value:
+        return True
+    return False
+
+
+def _fetch(dataset: str, ticker: str, loader: Callable[[], T], *params) -> T:
+    """带缓存、合并并发地执行 loader，key = (dataset, ticker, *params)"""
+    cache = _get_cache()
+    key = (dataset, ticker, *params)
+
+    value = cache.get(key, MISSING)
+    if value is not MISSING:
+        return value
+
+    def load():
+        value = loader()
+        if not _is_empty(value):
+            cache.set(key, value, ttl=_ttl(dataset))
+        return value
+
+    return _singleflight.do(key, load)
+
+
+def get_ticker(ticker: str) -> yf.Ticker:
+    """创建 yfinance Ticker 对象"""
+    return yf.Ticker(ticker.upper())
+
+
+def get_info(ticker: str) -> dict:
+    """股票基本信息 (Ticker.info)"""
+    ticker = ticker.upper()
+    return _fetch("info", ticker, lambda: get_ticker(ticker).info)
+
+
+def _load_history(ticker: str, period: str):
+    try:
+        return history_store.get_history(ticker, period)
+    except (OSError, ValueError) as e:
+        # ValueError: 读到损坏的 .npy / meta.json
+        logger.warning(f"History store unavailable for {ticker}: {e}, fetching directly")
+        return get_ticker(ticker).history(period=period)
+
+
+def get_history(ticker: str, period: str = "1mo"):
+    """历史日线行情 (本地 OHLCV 存储，按需增量同步)"""
+    ticker = ticker.upper()
+    return _fetch("history", ticker, lambda: _load_history(ticker, period), period)
+
+
+def get_news(ticker: str) -> list:
+    """最新新闻 (Ticker.news)"""
+    ticker = ticker.upper()
+    return _fetch("news", ticker, lambda: get_ticker(ticker).news)
+
+
+def get_options(ticker: str) -> tuple:
+    """期权到期日列表 (Ticker.options)"""
+    ticker = ticker.upper()
+    return _fetch("options", ticker, lambda: get_ticker(ticker).options)
+
+
+def get_option_chain(ticker: str, expiration_date: str):
+    """指定到期日的期权链 (Ticker.option_chain)"""
+    ticker = ticker.upper()
+    return _fetch(
+        "option_chain", ticker,
+        lambda: get_ticker(ticker).option_chain(expiration_date),
+        expiration_date,
+    )
+
+
+def get_shares_full(ticker: str, start: str, end: str | None = None):
+    """流通股数历史 (Ticker.get_shares_full)"""
+    ticker = ticker.upper()
+    return _fetch(
+        "shares", ticker,
+        lambda: get_ticker(ticker).get_shares_full(start=start, end=end),
+        start, end,
+    )
+
+
+def get_attribute(ticker: str, dataset: str, attr: str):
+    """
+    读取 Ticker 的 DataFrame 属性，例如:
+    - statements: income_stmt, balance_sheet, cashflow ...
+    - holders: institutional_holders, major_holders ...
+    - recommendations: recommendations, upgrades_downgrades ...
+    - actions: actions, dividends, splits
+    """
+    ticker = ticker.upper()
+    return _fetch(dataset, ticker, lambda: getattr(get_ticker(ticker), attr), attr)
+
+
+def _to_float(value) -> float | None:
+    if value is None:
+        return None
+    value = float(value)
+    return None if math.isnan(value) else value
+
+
+def _make_quote(price, previous_close, volume) -> dict | None:
+    """统一的报价结构，price 缺失时返回 None"""
+    price = _to_float(price)
+    if price is None:
+        return None
+    previous_close = _to_float(previous_close)
+    volume = _to_float(volume)
+
+    change = change_percent = None
+    if previous_close:
+        change = price - previous_close
+        change_percent = change / previous_close * 100
+
+    return {
+        "price": price,
+        "previous_close": previous_close,
+        "change": change,
+        "change_percent": change_percent,
+        "volume": int(volume) if volume is not None else None,
+    }
+
+
+def _download_quotes(symbols: list[str]) -> dict[str, dict]:
+    """一次 yf.download 批量获取多只股票最近的日线，计算报价"""
+    import pandas as pd
+
+    try:
+        df = yf.download(
+            symbols,
+            period="5d",
+            interval="1d",
+            group_by="ticker",
+            auto_adjust=False,
+            threads=True,
+            progress=False,
+        )
+    except Exception as e:
+        logger.warning(f"Batch download failed for {len(symbols)} symbols: {e}")
+        return {}
+
+    if df is None or df.empty:
+        return {}
+
+    quotes = {}
+    for symbol in symbols:
+        if isinstance(df.columns, pd.MultiIndex):
+            if symbol not in df.columns.get_level_values(0):
+                continue
+            frame = df[symbol]
+        elif len(symbols) == 1:
+            frame = df
+        else:
+            continue
+
+        frame = frame.dropna(subset=["Close"])
+        if frame.empty:
+            continue
+
+        previous_close = frame["Close"].iloc[-2] if len(frame) > 1 else None
+        quote = _make_quote(frame["Close"].iloc[-1], previous_close, frame["Volume"].iloc[-1])
+        if quote:
+            quotes[symbol] = quote
+    return quotes
+
+
+def _quote_from_info(symbol: str) -> dict | None:
+    """回退路径: 通过 Ticker.info 获取单只股票报价"""
+    try:
+        info = get_info(symbol)
+    except Exception as e:
+        logger.warning(f"Quote fallback failed for {symbol}: {e}")
+        return None
+    return _make_quote(
+        info.get("regularMarketPrice") or info.get("currentPrice"),
+        info.get("regularMarketPreviousClose") or info.get("previousClose"),
+        info.get("regularMarketVolume") or info.get("volume"),
+    )
+
+
+def get_quotes(symbols: list[str]) -> dict[str, dict | None]:
+    """
+    批量报价 (用于自选股列表)
+    1. 先查缓存
+    2. 未命中的用一次多 ticker 下载获取
+    3. 下载中缺失的并行回退到 Ticker.info
+    返回 {symbol: quote | None}，顺序与输入一致
+    """
+    cache = _get_cache()
+    symbols = list(dict.fromkeys(s.upper() for s in symbols))
+    quotes: dict[str, dict | None] = {}
+
+    missing = []
+    for symbol in symbols:
+        quote = cache.get(("quote", symbol), MISSING)
+        if quote is MISSING:
+            missing.append(symbol)
+        else:
+            quotes[symbol] = quote
+
+    if missing:
+        fetched = _download_quotes(missing)
+
+        fallback = [s for s in missing if s not in fetched]
+        if fallback:
+            with ThreadPoolExecutor(max_workers=min(8, len(fallback))) as pool:
+                for symbol, quote in zip(fallback, pool.map(_quote_from_info, fallback)):
+                    if quote:
+                        fetched[symbol] = quote
+
+        ttl = _ttl("quote")
+        for symbol in missing:
+            quote = fetched.get(symbol)
+            if quote:
+                cache.set(("quote", symbol), quote, ttl=ttl)
+            quotes[symbol] = quote
+
+    return {symbol: quotes.get(symbol) for symbol in symbols}
+
+
+def cache_stats() -> dict:
+    """缓存统计 (命中/未命中/淘汰)"""
+    return _get_cache().stats()
+
+
+def singleflight_stats() -> dict:
+    """请求合并统计 (实际调用次数 / 被合并次数)"""
+    return _singleflight.stats()
+
+
+def clear_cache():
+    """清空缓存"""
+    _get_cache().clear()
@@ -1,8 +1,13 @@
 """
 RAG 文档问答 - 基于 SEC 文件
 LangChain 1.x 版本
+
+加载 / 构建索引和 FAISS 检索都是阻塞操作，统一放在 "rag" 线程池执行；
+问题向量使用异步 embedding 请求，不占用事件循环。
 """
+import asyncio
 import logging
+from functools import lru_cache
 from pathlib import Path
 
 from langchain_openai import OpenAIEmbeddings, ChatOpenAI
@@ -15,22 +20,54 @@ from langchain_core.output_parsers import StrOutputParser
 from langchain_core.runnables import RunnablePassthrough
 
 from config import get_settings
+from executor import get_executor
+from embedding_batch import BatchedEmbeddings
+from embedding_cache import CachedEmbeddings
+from vector_index import get_vector_store, sync_vector_store
 
 logger = logging.getLogger(__name__)
 
+# 进行中的主索引构建 (并发的调用方等待同一个任务)
+_build_task: asyncio.Task | None = None
+
+@lru_cache
+def get_embeddings() -> CachedEmbeddings:
+    """
+    共享的 Embeddings 客户端
+    文档向量先查本地内容哈希缓存，未命中的分块按 token 数分批并发请求
+    """
+    settings = get_settings()
+    return CachedEmbeddings(
+        BatchedEmbeddings(
+            OpenAIEmbeddings(
+                model=settings.embedding_model,
+                api_key=settings.openai_api_key
+            ),
+            batch_tokens=settings.embedding_batch_tokens,
+            max_concurrency=settings.embedding_max_concurrency,
+            max_retries=settings.embedding_max_retries,
+        ),
+        model=settings.embedding_model,
+        cache_dir=settings.embedding_cache_dir,
+    )
+
 
 class RAGService:
-    """SEC 文档 RAG 问答服务"""
+    """
+    SEC 文档 RAG 问答服务
+    向量索引在进程内共享 (见 vector_index)，每个实例只保存对话历史
+    """
     
     def __init__(self):
         self.settings = get_settings()
-        self.embeddings = OpenAIEmbeddings(
-            model=self.settings.embedding_model,
-            api_key=self.settings.openai_api_key
-        )
-        self.vector_store: FAISS | None = None
+        self.embeddings = get_embeddings()
         self.chat_history: list[BaseMessage] = []
     
+    @property
+    def vector_store(self) -> FAISS | None:
+        """当前共享的向量索引 (本进程或其他进程重建后自动指向新索引)"""
+        return get_vector_store(self._get_vector_store_path(), self.embeddings)
+    
     def _get_documents_path(self) -> Path:
         """获取文档路径"""
         return self.settings.documents_dir / "sec_filing_combined.txt"
@@ -39,29 +76,32 @@ class RAGService:
         """获取向量存储路径"""
         return self.settings.vector_store_dir
     
+    def _load_vector_store(self) -> FAISS | None:
+        """加载共享索引，失败返回 None"""
+        try:
+            return self.vector_store
+        except Exception as e:
+            logger.warning(f"Failed to load vector store: {e}, rebuilding...")
+            return None
+    
     async def initialize(self):
-        """初始化向量存储"""
-        vector_store_path = self._get_vector_store_path()
+        """初始化向量存储 (每个进程加载一次并复用，磁盘上的索引被重建时重新加载)"""
+        if await get_executor("rag").run(self._load_vector_store) is not None:
+            return
         
-        # 尝试加载已有的向量存储
-        if vector_store_path.exists():
-            try:
-                logger.info(f"Loading existing vector store from {vector_store_path}")
-                self.vector_store = FAISS.load_local(
-                    str(vector_store_path), 
-                    self.embeddings,
-                    allow_dangerous_deserialization=True
-                )
-                logger.info("Vector store loaded successfully")
-                return
-            except Exception as e:
-                logger.warning(f"Failed to load vector store: {e}, rebuilding...")
-        
-        # 构建新的向量存储
+        # 构建新的向量存储 (并发请求只构建一次，其余等待同一次构建)
         await self._build_vector_store()
     
-    async def _build_vector_store(self):
-        """构建向量存储"""
+    async def _build_vector_store(self) -> dict:
+        """在线程池中构建 (或增量更新) 向量存储，构建可能较久，不设超时"""
+        global _build_task
+        if _build_task is None or _build_task.done():
+            _build_task = asyncio.create_task(get_executor("rag").run(self._build_index, timeout=None))
+        # 某个请求被取消时不影响构建本身
+        return await asyncio.shield(_build_task)
+    
+    def _build_index(self) -> dict:
+        """构建 (或增量更新) 向量存储，返回新增 / 删除 / 保留的分块数"""
         documents_path = self._get_documents_path()
         
         if not documents_path.exists():
@@ -83,15 +123,11 @@ class RAGService:
         splits = text_splitter.split_documents(documents)
         logger.info(f"Split into {len(splits)} chunks")
         
-        # 创建向量存储
-        logger.info("Creating vector store (this may take a while)...")
-        self.vector_store = FAISS.from_documents(splits, self.embeddings)
-        
-        # 保存向量存储
+        # 与现有索引比对，只嵌入新增分块，完成后原子替换
         vector_store_path = self._get_vector_store_path()
-        vector_store_path.parent.mkdir(parents=True, exist_ok=True)
-        self.vector_store.save_local(str(vector_store_path))
+        _, stats = sync_vector_store(vector_store_path, splits, self.embeddings)
         logger.info(f"Vector store saved to {vector_store_path}")
+        return stats
     
     def _format_docs(self, docs) -> str:
         """格式化检索到的文档"""
@@ -124,14 +160,10 @@ class RAGService:
         Returns: (answer, sources)
         """
         try:
-            if self.vector_store is None:
+            vector_store = await get_executor("rag").run(lambda: self.vector_store)
+            if vector_store is None:
                 raise RuntimeError("Vector store not initialized. Call initialize() first.")
             
-            retriever = self.vector_store.as_retriever(
-                search_type="similarity",
-                search_kwargs={"k": 4}
-            )
-            
             llm = ChatOpenAI(
                 model=self.settings.openai_model,
                 temperature=0,
@@ -152,8 +184,9 @@ Answer the question based on the context. If the answer is not in the context, s
                 ("user", "{question}")
             ])
             
-            # 检索文档
-            docs = retriever.invoke(question)
+            # 检索文档: 异步获取问题向量，FAISS 搜索放到线程池
+            query_vector = await self.embeddings.aembed_query(question)
+            docs = await get_executor("rag").run(vector_store.similarity_search_by_vector, query_vector, k=4)
             context = self._format_docs(docs)
             history = self._format_history()
             
@@ -188,19 +221,12 @@ Answer the question based on the context. If the answer is not in the context, s
         """清除对话历史"""
         self.chat_history = []
     
-    async def rebuild_index(self):
-        """重建向量索引"""
-        # 删除旧的向量存储
-        vector_store_path = self._get_vector_store_path()
-        if vector_store_path.exists():
-            import shutil
-            shutil.rmtree(vector_store_path)
-        
-        # 重建
-        await self._build_vector_store()
+    async def rebuild_index(self) -> dict:
+        """增量更新向量索引 (完成前，查询继续使用旧索引)"""
+        return await self._build_vector_store()
 
 
-# 全局 RAG 服务实例缓存
+# RAG 服务实例缓存 (按 conversation_id，只含对话历史)
 _rag_cache: dict[str, RAGService] = {}
 
 
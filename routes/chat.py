@@ -13,7 +13,7 @@ import json
 from database import get_db
 from models import Conversation, Message, User
 from schemas import ChatRequest, ChatResponse, ConversationSchema, ConversationListItem
-from agent import get_agent, remove_agent
+from agent import get_agent, remove_agent, agent_cache_stats
 from routes.auth import get_current_user
 from config import get_settings
 
@@ -210,6 +210,12 @@ async def chat_stream(
     return StreamingResponse(generate(), media_type="text/event-stream")
 
 
+@router.get("/agents/stats")
+async def get_agent_stats():
+    """Agent 实例缓存统计"""
+    return agent_cache_stats()
+
+
 @router.get("/conversations", response_model=list[ConversationListItem])
 async def list_conversations(db: AsyncSession = Depends(get_db)):
     """获取所有 Agent 对话列表"""
@@ -10,7 +10,9 @@ from sqlalchemy.orm import selectinload
 from database import get_db
 from models import Conversation, Message
 from schemas import RAGRequest, RAGResponse, ConversationSchema, ConversationListItem
-from rag import get_rag_service, remove_rag_service
+from rag import get_embeddings, get_rag_service, remove_rag_service
+from sec_prefetch import get_sec_prefetcher
+from vector_index import build_stats, loaded_indexes
 
 router = APIRouter()
 
@@ -77,11 +79,39 @@ async def ask_document(request: RAGRequest, db: AsyncSession = Depends(get_db)):
 
 @router.post("/rebuild-index")
 async def rebuild_index():
-    """重建向量索引"""
+    """重建向量索引 (增量: 只嵌入有变化的分块)"""
     from rag import RAGService
     service = RAGService()
-    await service.rebuild_index()
-    return {"status": "Index rebuilt successfully"}
+    stats = await service.rebuild_index()
+    return {"status": "Index rebuilt successfully", **stats}
+
+
+@router.get("/embeddings/stats")
+async def embedding_cache_stats():
+    """Embedding 缓存命中统计"""
+    return get_embeddings().stats()
+
+
+@router.get("/index/stats")
+async def index_stats():
+    """已加载的向量索引及构建合并统计"""
+    return {"loaded": loaded_indexes(), "builds": build_stats()}
+
+
+@router.get("/sec/prefetch")
+async def sec_prefetch_status():
+    """自选股 10-K 后台预取状态"""
+    return get_sec_prefetcher().status()
+
+
+@router.post("/sec/prefetch")
+async def sec_prefetch_now():
+    """立即对所有自选股执行一次预取"""
+    prefetcher = get_sec_prefetcher()
+    if not prefetcher.running:
+        raise HTTPException(status_code=503, detail="SEC prefetch is disabled")
+    scheduled = prefetcher.trigger()
+    return {"status": "scheduled" if scheduled else "already running"}
 
 
 @router.get("/conversations", response_model=list[ConversationListItem])
@@ -12,22 +12,54 @@ Architecture:
                                          │ WebSocket     │
                                          │ clients       │
                                          └───────────────┘
+
+Each client only receives records for the symbols it subscribed to
+(see subscriptions.SubscriptionIndex). Upstream Alpaca subscriptions are
+reference counted across this worker's clients: the worker's reader
+subscribes a symbol when its first local watcher appears and unsubscribes
+when the last one leaves. Each worker also registers its symbols in Redis
+with a heartbeat (subscriptions.SymbolRefCounts) for cross-worker status.
+
+Broadcasting never awaits a client: messages go into a bounded per-client
+queue drained by that client's own writer task (see client_sender.ClientSender),
+so a slow client cannot stall the Redis consumer or the other clients.
+
+Each Alpaca frame is split into one stream entry per symbol ({"S": symbol,
+"data": JSON array of its records}) written in a single pipelined round trip;
+the consumer broadcasts each XREADGROUP batch as one list of records and
+acknowledges it with a single multi-id XACK.
+
+Optional conflation (see conflation.Conflator) keeps only the latest quote
+per symbol and sums trades into per-interval volume: upstream before the
+Redis stream (realtime_conflate_ms) and/or per client ("throttle" action).
 """
 import asyncio
 import json
 import logging
+import os
+import socket
 from typing import Set
 from contextlib import asynccontextmanager
 
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect
 from config import get_settings
+from client_sender import ClientSender
+from conflation import Conflator
+from subscriptions import SubscriptionIndex, SymbolRefCounts
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
 
-# Store active WebSocket connections
-active_connections: Set[WebSocket] = set()
+# Active WebSocket connections and their send queues
+active_connections: dict[WebSocket, ClientSender] = {}
+# Symbols subscribed on the upstream Alpaca connection
 subscribed_symbols: Set[str] = set()
+# Which client watches which symbol
+subscriptions = SubscriptionIndex()
+# This worker's symbol registration in Redis (created on first use)
+symbol_refcounts: SymbolRefCounts | None = None
+refcount_heartbeat_task = None
+_refcounts_lock = asyncio.Lock()
 
 # Global instances
 redis_client = None
@@ -63,6 +95,8 @@ class AlpacaReader:
         self.running = False
         self.settings = get_settings()
         self._lock = asyncio.Lock()
+        # Upstream conflation (None when realtime_conflate_ms is 0)
+        self.conflator = Conflator(self.settings.realtime_aggregate_trades) if self.settings.realtime_conflate_ms > 0 else None
         
     async def start(self):
         """Start the Alpaca reader (only one can run)"""
@@ -109,7 +143,8 @@ class AlpacaReader:
             return False
     
     async def subscribe(self, symbols: list[str]):
-        """Subscribe to symbols"""
+        """Subscribe to symbols (remembered and replayed on reconnect)"""
+        subscribed_symbols.update(symbols)
         if not self.ws or not self.running:
             return
             
@@ -120,13 +155,13 @@ class AlpacaReader:
                 "quotes": symbols
             }
             await self.ws.send(json.dumps(sub_msg))
-            subscribed_symbols.update(symbols)
             logger.info(f"Subscribed to: {symbols}")
         except Exception as e:
             logger.error(f"Subscribe error: {e}")
     
     async def unsubscribe(self, symbols: list[str]):
         """Unsubscribe from symbols"""
+        subscribed_symbols.difference_update(symbols)
         if not self.ws or not self.running:
             return
             
@@ -137,18 +172,50 @@ class AlpacaReader:
                 "quotes": symbols
             }
             await self.ws.send(json.dumps(unsub_msg))
-            subscribed_symbols.difference_update(symbols)
             logger.info(f"Unsubscribed from: {symbols}")
         except Exception as e:
             logger.error(f"Unsubscribe error: {e}")
     
+    async def _publish(self, redis, data: list | dict):
+        """Write a frame to the Redis Stream (one entry per symbol, pipelined), or broadcast directly without Redis"""
+        if redis:
+            records = data if isinstance(data, list) else [data]
+            by_symbol: dict[str, list] = {}
+            for record in records:
+                symbol = record.get("S", "") if isinstance(record, dict) else ""
+                by_symbol.setdefault(symbol, []).append(record)
+            async with redis.pipeline(transaction=False) as pipe:
+                for symbol, group in by_symbol.items():
+                    pipe.xadd(
+                        self.settings.redis_stream_name,
+                        {"S": symbol, "data": json.dumps(group)},
+                        maxlen=10000  # Keep last 10k entries
+                    )
+                await pipe.execute()
+        else:
+            # Fallback: broadcast directly (in-memory mode)
+            await broadcast(data)
+    
+    async def _flush_conflated(self, redis):
+        """Publish the conflated records once per interval"""
+        interval = self.settings.realtime_conflate_ms / 1000
+        while True:
+            await asyncio.sleep(interval)
+            records = self.conflator.drain()
+            if not records:
+                continue
+            try:
+                await self._publish(redis, records)
+            except Exception as e:
+                logger.warning(f"Failed to publish conflated quotes: {e}")
+    
     async def read_and_publish(self):
         """Read from Alpaca and publish to Redis Stream"""
         redis = await get_redis()
-        settings = self.settings
         reconnect_delay = 5
         max_reconnect_delay = 60  # Cap at 60 seconds
         consecutive_failures = 0
+        flusher = asyncio.create_task(self._flush_conflated(redis)) if self.conflator else None
         
         while True:
             try:
@@ -178,17 +245,11 @@ class AlpacaReader:
                 data = json.loads(message)
                 consecutive_failures = 0  # Reset on successful message
                 
-                # Publish to Redis Stream or broadcast directly
-                if redis:
-                    # Write to Redis Stream
-                    await redis.xadd(
-                        settings.redis_stream_name,
-                        {"data": json.dumps(data)},
-                        maxlen=10000  # Keep last 10k messages
-                    )
+                # Publish to Redis Stream or broadcast directly (conflated: on the next flush)
+                if self.conflator:
+                    self.conflator.add(data if isinstance(data, list) else [data])
                 else:
-                    # Fallback: broadcast directly (in-memory mode)
-                    await broadcast(data)
+                    await self._publish(redis, data)
                     
             except asyncio.TimeoutError:
                 # No data received for 30s - likely market closed or no subscriptions
@@ -211,6 +272,9 @@ class AlpacaReader:
                 consecutive_failures += 1
                 reconnect_delay = min(reconnect_delay * 1.5, max_reconnect_delay)
                 await asyncio.sleep(reconnect_delay)
+        
+        if flusher:
+            flusher.cancel()
     
     async def close(self):
         """Close connection"""
@@ -265,17 +329,21 @@ class RedisConsumer:
                     block=1000  # Block for 1 second
                 )
                 
-                if messages:
-                    for stream, entries in messages:
-                        for msg_id, fields in entries:
-                            data = json.loads(fields["data"])
-                            
-                            # Broadcast to all WebSocket clients
-                            await broadcast(data)
-                            
-                            # Acknowledge message
-                            await redis.xack(stream_name, group_name, msg_id)
-                            
+                for stream, entries in messages or []:
+                    if not entries:
+                        continue
+                    records = []
+                    for msg_id, fields in entries:
+                        data = json.loads(fields["data"])
+                        if isinstance(data, list):
+                            records.extend(data)
+                        else:
+                            records.append(data)
+                    
+                    # Broadcast the whole batch, then acknowledge it in one round trip
+                    await broadcast(records)
+                    await redis.xack(stream_name, group_name, *[msg_id for msg_id, _ in entries])
+                    
             except asyncio.CancelledError:
                 logger.info("Redis consumer cancelled")
                 break
@@ -295,22 +363,70 @@ alpaca_reader = AlpacaReader()
 redis_consumer = RedisConsumer()
 
 
-async def broadcast(data: dict):
-    """Broadcast data to all connected WebSocket clients"""
+async def get_refcounts() -> SymbolRefCounts:
+    """This worker's symbol registration (cleared on first use, kept alive by a heartbeat)"""
+    global symbol_refcounts, refcount_heartbeat_task
+    async with _refcounts_lock:
+        if symbol_refcounts is None:
+            redis = await get_redis()
+            prefix = f"{get_settings().redis_stream_name}:symbol_refs"
+            worker_id = f"{socket.gethostname()}:{os.getpid()}"
+            refcounts = SymbolRefCounts(redis, prefix, worker_id)
+            await refcounts.reset()
+            if redis:
+                refcount_heartbeat_task = asyncio.create_task(refcounts.keep_alive())
+            symbol_refcounts = refcounts
+    return symbol_refcounts
+
+
+async def watch(websocket: WebSocket, symbols: list[str]):
+    """Add a client's symbols; subscribe upstream only for symbols this worker wasn't watching yet"""
+    added = subscriptions.subscribe(websocket, symbols)
+    if added:
+        await alpaca_reader.subscribe(added)
+        await (await get_refcounts()).acquire(added)
+
+
+async def unwatch(websocket: WebSocket, symbols: list[str] | None = None):
+    """Remove a client's symbols (all of them if None); unsubscribe upstream on this worker's last watcher"""
+    if symbols is None:
+        removed = subscriptions.remove_client(websocket)
+    else:
+        removed = subscriptions.unsubscribe(websocket, symbols)
+    if removed:
+        await alpaca_reader.unsubscribe(removed)
+        await (await get_refcounts()).release(removed)
+
+
+async def broadcast(data: list | dict):
+    """Queue an Alpaca frame for the clients subscribed to its symbols (never waits on a client)"""
     if not active_connections:
         return
-        
-    message = json.dumps(data)
-    disconnected = set()
     
-    for connection in active_connections:
-        try:
-            await connection.send_text(message)
-        except:
-            disconnected.add(connection)
-    
-    # Remove disconnected clients
-    active_connections.difference_update(disconnected)
+    records = data if isinstance(data, list) else [data]
+    for connection, message, parts in subscriptions.route(records):
+        sender = active_connections.get(connection)
+        if sender is None:
+            continue
+        if sender.conflator is not None:
+            sender.offer(r for r in records if isinstance(r, dict) and r.get("S") in parts)
+        else:
+            sender.enqueue(message, parts)
+
+
+def sender_stats() -> dict:
+    """Queue depth and drop counters across all client send queues"""
+    stats = [sender.stats() for sender in active_connections.values()]
+    return {
+        "policy": get_settings().realtime_overflow_policy,
+        "queue_size": get_settings().realtime_queue_size,
+        "total_depth": sum(s["depth"] for s in stats),
+        "max_depth": max((s["depth"] for s in stats), default=0),
+        "sent": sum(s["sent"] for s in stats),
+        "dropped": sum(s["dropped"] for s in stats),
+        "conflated": sum(s["conflated"] for s in stats),
+        "slowest": sorted(stats, key=lambda s: s["depth"], reverse=True)[:5],
+    }
 
 
 async def start_background_tasks():
@@ -339,19 +455,29 @@ async def websocket_quotes(websocket: WebSocket):
     Client can send:
     - {"action": "subscribe", "symbols": ["AAPL", "MSFT"]}
     - {"action": "unsubscribe", "symbols": ["AAPL"]}
+    - {"action": "throttle", "interval_ms": 250}  (latest quote per symbol every 250ms; 0 = every update)
     """
     await websocket.accept()
-    active_connections.add(websocket)
-    logger.info(f"Client connected. Total connections: {len(active_connections)}")
-    
     settings = get_settings()
+    # All outgoing messages go through the queue so only the writer task sends on this socket
+    sender = ClientSender(
+        websocket,
+        maxsize=settings.realtime_queue_size,
+        policy=settings.realtime_overflow_policy,
+        send_timeout=settings.realtime_send_timeout,
+        on_close=lambda s: active_connections.pop(s.websocket, None),
+    )
+    active_connections[websocket] = sender
+    if settings.realtime_client_throttle_ms > 0:
+        sender.throttle(settings.realtime_client_throttle_ms / 1000, settings.realtime_aggregate_trades)
+    logger.info(f"Client connected. Total connections: {len(active_connections)}")
     
     # Check if Alpaca is configured
     if not settings.alpaca_api_key:
-        await websocket.send_json({
+        sender.enqueue(json.dumps({
             "type": "error",
             "message": "Alpaca API not configured. Add ALPACA_API_KEY and ALPACA_SECRET_KEY to .env"
-        })
+        }))
     
     # Start background tasks if needed
     await start_background_tasks()
@@ -364,25 +490,44 @@ async def websocket_quotes(websocket: WebSocket):
             symbols = [s.upper() for s in symbols]
             
             if action == "subscribe" and symbols:
-                await alpaca_reader.subscribe(symbols)
-                await websocket.send_json({
+                await watch(websocket, symbols)
+                sender.enqueue(json.dumps({
                     "type": "subscribed",
                     "symbols": symbols
-                })
+                }))
                 
             elif action == "unsubscribe" and symbols:
-                await alpaca_reader.unsubscribe(symbols)
-                await websocket.send_json({
+                await unwatch(websocket, symbols)
+                sender.enqueue(json.dumps({
                     "type": "unsubscribed", 
                     "symbols": symbols
-                })
+                }))
+            
+            elif action == "throttle":
+                try:
+                    interval_ms = min(max(int(data.get("interval_ms", 0)), 0), 10_000)
+                except (ValueError, TypeError):
+                    sender.enqueue(json.dumps({
+                        "type": "error",
+                        "message": "interval_ms must be an integer number of milliseconds"
+                    }))
+                    continue
+                sender.throttle(interval_ms / 1000, settings.realtime_aggregate_trades)
+                sender.enqueue(json.dumps({
+                    "type": "throttled",
+                    "interval_ms": interval_ms
+                }))
                 
     except WebSocketDisconnect:
         logger.info("Client disconnected")
     except Exception as e:
         logger.error(f"WebSocket error: {e}")
     finally:
-        active_connections.discard(websocket)
+        sender.close()
+        try:
+            await unwatch(websocket)
+        except Exception as e:
+            logger.error(f"Failed to release subscriptions: {e}")
         logger.info(f"Connection closed. Total connections: {len(active_connections)}")
 
 
@@ -398,5 +543,9 @@ async def realtime_status():
         "redis_connected": redis is not None,
         "redis_consumer_running": redis_consumer.running,
         "active_connections": len(active_connections),
-        "subscribed_symbols": list(subscribed_symbols)
+        "subscribed_symbols": list(subscribed_symbols),
+        "subscriptions": subscriptions.stats(),
+        "symbol_watchers": await (await get_refcounts()).counts(),
+        "send_queues": sender_stats(),
+        "upstream_conflation": alpaca_reader.conflator.stats() if alpaca_reader.conflator else None
     }
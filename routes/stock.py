@@ -1,15 +1,81 @@
 """
 Stock API - 直接查询股票数据（简单 API，不经过 Agent）
 用于前端图表展示等场景
+
+yfinance 是阻塞调用，统一放到专用线程池执行，避免卡住事件循环。
 """
+import asyncio
+
 from fastapi import APIRouter, Query, HTTPException
-import yfinance as yf
 
-from schemas import StockInfoResponse, StockChartData
+import market_data
+from downsample import lttb, resample_ohlc
+from executor import get_executor, executor_stats
+from schemas import StockInfoResponse, StockChartData, BatchQuoteRequest, BatchQuoteResponse
 
 router = APIRouter()
 
 
+async def run_yfinance(fn, *args):
+    """在 yfinance 线程池中执行，超时返回 504"""
+    try:
+        return await get_executor("yfinance").run(fn, *args)
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=504, detail="Yahoo Finance request timed out")
+
+
+def _round(value: float | None, digits: int) -> float | None:
+    return round(value, digits) if value is not None else None
+
+
+async def fetch_batch_quotes(symbols: list[str]) -> BatchQuoteResponse:
+    """批量获取报价并转换为列式结构 (供 /batch 和自选股路由复用)"""
+    quotes = await run_yfinance(market_data.get_quotes, symbols)
+    
+    response = BatchQuoteResponse(symbols=[], price=[], change=[], change_percent=[], volume=[])
+    for symbol, quote in quotes.items():
+        quote = quote or {}
+        response.symbols.append(symbol)
+        response.price.append(_round(quote.get("price"), 4))
+        response.change.append(_round(quote.get("change"), 4))
+        response.change_percent.append(_round(quote.get("change_percent"), 2))
+        response.volume.append(quote.get("volume"))
+        if not quote:
+            response.missing.append(symbol)
+    return response
+
+
+@router.get("/cache/stats")
+async def get_cache_stats():
+    """行情数据缓存统计 (命中率、淘汰次数、合并的并发请求数)"""
+    return {
+        "cache": market_data.cache_stats(),
+        "coalescing": market_data.singleflight_stats(),
+    }
+
+
+@router.get("/executor/stats")
+async def get_executor_stats():
+    """线程池统计 (队列深度、执行中任务数、超时次数)"""
+    return executor_stats()
+
+
+@router.post("/batch", response_model=BatchQuoteResponse)
+async def get_batch_quotes(request: BatchQuoteRequest):
+    """
+    批量报价 (一次请求获取整个自选股列表)
+    
+    返回列式结构: symbols / price / change / change_percent / volume 按下标对齐，
+    获取失败的股票值为 null 并列在 missing 中。
+    """
+    try:
+        return await fetch_batch_quotes(request.symbols)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 @router.get("/{ticker}", response_model=StockInfoResponse)
 async def get_stock_info(ticker: str):
     """
@@ -19,8 +85,7 @@ async def get_stock_info(ticker: str):
     如果需要自然语言对话，请使用 /api/chat
     """
     try:
-        stock = yf.Ticker(ticker.upper())
-        info = stock.info
+        info = await run_yfinance(market_data.get_info, ticker)
         
         if not info or not info.get("regularMarketPrice"):
             raise HTTPException(status_code=404, detail=f"Stock '{ticker}' not found")
@@ -43,20 +108,32 @@ async def get_stock_info(ticker: str):
 @router.get("/{ticker}/chart", response_model=StockChartData)
 async def get_chart_data(
     ticker: str,
-    period: str = Query("1mo", pattern="^(1d|5d|1mo|3mo|6mo|1y|2y|5y|max)$")
+    period: str = Query("1mo", pattern="^(1d|5d|1mo|3mo|6mo|1y|2y|5y|max)$"),
+    interval: str = Query("1d", pattern="^(1d|1wk|1mo)$", description="K 线周期，1wk/1mo 会聚合为周线/月线 OHLC"),
+    max_points: int | None = Query(None, ge=3, le=10000, description="最多返回的点数 (LTTB 降采样)"),
 ):
     """获取图表数据（用于前端绑定图表）"""
     try:
-        stock = yf.Ticker(ticker.upper())
-        history = stock.history(period=period)
+        history = await run_yfinance(market_data.get_history, ticker, period)
         
         if history.empty:
             raise HTTPException(status_code=404, detail=f"No data for '{ticker}'")
         
+        aggregated = interval != "1d"
+        if aggregated:
+            history = resample_ohlc(history, interval)
+        
+        if max_points and len(history) > max_points:
+            keep = lttb(history.index.asi8, history["Close"].to_numpy(), max_points)
+            history = history.iloc[keep]
+        
         return StockChartData(
             dates=history.index.strftime("%Y-%m-%d").tolist(),
             prices=history["Close"].tolist(),
             volumes=history["Volume"].astype(int).tolist(),
+            opens=history["Open"].tolist() if aggregated else None,
+            highs=history["High"].tolist() if aggregated else None,
+            lows=history["Low"].tolist() if aggregated else None,
         )
     except HTTPException:
         raise
@@ -68,8 +145,7 @@ async def get_chart_data(
 async def get_stock_news(ticker: str):
     """获取股票新闻"""
     try:
-        stock = yf.Ticker(ticker.upper())
-        news = stock.news or []
+        news = await run_yfinance(market_data.get_news, ticker) or []
         
         return [
             {
@@ -79,5 +155,7 @@ async def get_stock_news(ticker: str):
             }
             for n in news[:10]
         ]
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -10,6 +10,9 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from database import get_db
 from models import Watchlist, User
 from routes.auth import get_current_user, require_user
+from routes.stock import fetch_batch_quotes
+from schemas import BatchQuoteResponse
+from sec_prefetch import get_sec_prefetcher
 
 router = APIRouter()
 
@@ -57,6 +60,7 @@ async def get_watchlists(
         for wl in default_lists:
             db.add(wl)
         await db.commit()
+        get_sec_prefetcher().schedule([s for wl in default_lists for s in wl.symbols.split(",")])
         
         # 重新查询
         result = await db.execute(
@@ -82,6 +86,7 @@ async def create_watchlist(
     db.add(watchlist)
     await db.commit()
     await db.refresh(watchlist)
+    get_sec_prefetcher().schedule(data.symbols)
     
     return WatchlistResponse.from_db(watchlist)
 
@@ -112,6 +117,8 @@ async def update_watchlist(
     
     await db.commit()
     await db.refresh(watchlist)
+    if data.symbols is not None:
+        get_sec_prefetcher().schedule(data.symbols)
     
     return WatchlistResponse.from_db(watchlist)
 
@@ -147,6 +154,31 @@ async def delete_watchlist(
     await db.commit()
 
 
+@router.get("/{watchlist_id}/quotes", response_model=BatchQuoteResponse)
+async def get_watchlist_quotes(
+    watchlist_id: int,
+    user: User = Depends(require_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """获取列表中所有股票的报价 (单次请求，列式结构)"""
+    result = await db.execute(
+        select(Watchlist).where(
+            Watchlist.id == watchlist_id,
+            Watchlist.user_id == user.id
+        )
+    )
+    watchlist = result.scalar_one_or_none()
+    
+    if not watchlist:
+        raise HTTPException(status_code=404, detail="Watchlist not found")
+    
+    symbols = [s.strip() for s in watchlist.symbols.split(",") if s.strip()]
+    if not symbols:
+        return BatchQuoteResponse(symbols=[], price=[], change=[], change_percent=[], volume=[])
+    
+    return await fetch_batch_quotes(symbols)
+
+
 @router.post("/{watchlist_id}/symbols/{symbol}")
 async def add_symbol(
     watchlist_id: int,
@@ -173,6 +205,7 @@ async def add_symbol(
         symbols.append(symbol)
         watchlist.symbols = ",".join(symbols)
         await db.commit()
+        get_sec_prefetcher().schedule([symbol])
     
     return {"message": f"Added {symbol}", "symbols": symbols}
 
@@ -1,7 +1,7 @@
 """
 Pydantic Schemas (请求/响应模型)
 """
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from datetime import datetime
 from enum import Enum
 
@@ -85,3 +85,21 @@ class StockChartData(BaseModel):
     dates: list[str]
     prices: list[float]
     volumes: list[int]
+    # 仅在按周/月聚合 (interval=1wk|1mo) 时返回
+    opens: list[float] | None = None
+    highs: list[float] | None = None
+    lows: list[float] | None = None
+
+
+class BatchQuoteRequest(BaseModel):
+    symbols: list[str] = Field(..., min_length=1, max_length=100)
+
+
+class BatchQuoteResponse(BaseModel):
+    """列式报价: 每个字段是与 symbols 对齐的数组"""
+    symbols: list[str]
+    price: list[float | None]
+    change: list[float | None]
+    change_percent: list[float | None]
+    volume: list[int | None]
+    missing: list[str] = []
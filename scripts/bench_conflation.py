@@ -0,0 +1,115 @@
+"""
+行情合并基准: 逐条发布 vs 按间隔合并
+
+模拟开盘时段的 Alpaca 数据流 (S 个 symbol，每个 symbol 每秒若干 quote / trade，
+每帧约 10 ms 内到达的记录)，在模拟时钟上统计:
+- Redis 写入次数 (每帧一次 XADD vs 每个合并间隔一次)
+- 单个客户端 (订阅 K 个 symbol) 收到的 WebSocket 帧数和记录数
+并校验合并后每个 symbol 的最新报价和总成交量与原始数据一致。
+
+用法:
+    python scripts/bench_conflation.py
+    python scripts/bench_conflation.py --symbols 200 --rate 50 --seconds 60 --interval-ms 250
+"""
+import argparse
+import random
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from conflation import Conflator  # noqa: E402
+
+
+def make_stream(symbols: list[str], rate: float, seconds: float, rng: random.Random) -> list[tuple[float, list[dict]]]:
+    """(到达时间, 帧) 列表: 每 10 ms 一帧，包含这段时间内产生的记录"""
+    per_tick = rate * len(symbols) * 0.01
+    stream = []
+    for tick in range(int(seconds * 100)):
+        frame = []
+        for _ in range(rng.randint(0, int(per_tick * 2))):
+            symbol = rng.choice(symbols)
+            price = round(rng.uniform(10, 500), 2)
+            if rng.random() < 0.8:
+                frame.append({"T": "q", "S": symbol, "bp": price, "bs": 1, "ap": price + 0.01, "as": 2,
+                              "t": f"{tick}", "z": "C"})
+            else:
+                frame.append({"T": "t", "S": symbol, "p": price, "s": rng.randint(1, 500),
+                              "t": f"{tick}", "z": "C"})
+        if frame:
+            stream.append((tick / 100, frame))
+    return stream
+
+
+def replay(stream, interval: float, watched: set[str], aggregate_trades: bool) -> dict:
+    conflator = Conflator(aggregate_trades)
+    writes = ws_frames = ws_records = 0
+    latest, volume = {}, {}
+    next_flush = interval
+
+    def flush():
+        nonlocal writes, ws_frames, ws_records
+        records = conflator.drain()
+        if not records:
+            return
+        writes += 1
+        mine = [r for r in records if r["S"] in watched]
+        if mine:
+            ws_frames += 1
+            ws_records += len(mine)
+        for r in records:
+            if r["T"] == "q":
+                latest[r["S"]] = r["bp"]
+            else:
+                volume[r["S"]] = volume.get(r["S"], 0) + r["s"]
+
+    for at, frame in stream:
+        while at >= next_flush:
+            flush()
+            next_flush += interval
+        conflator.add(frame)
+    flush()
+    return {"writes": writes, "ws_frames": ws_frames, "ws_records": ws_records, "latest": latest, "volume": volume}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--symbols", type=int, default=200)
+    parser.add_argument("--rate", type=float, default=50, help="每个 symbol 每秒的记录数")
+    parser.add_argument("--seconds", type=float, default=60)
+    parser.add_argument("--per-client", type=int, default=10)
+    parser.add_argument("--interval-ms", type=int, default=250)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    symbols = [f"SYM{i:03d}" for i in range(args.symbols)]
+    watched = set(rng.sample(symbols, args.per_client))
+    stream = make_stream(symbols, args.rate, args.seconds, rng)
+
+    # 逐条发布: 每帧一次 XADD，包含订阅 symbol 的帧都要发给客户端
+    raw_records = sum(len(frame) for _, frame in stream)
+    raw_ws = [sum(1 for r in frame if r["S"] in watched) for _, frame in stream]
+    raw_latest, raw_volume = {}, {}
+    for _, frame in stream:
+        for r in frame:
+            if r["T"] == "q":
+                raw_latest[r["S"]] = r["bp"]
+            else:
+                raw_volume[r["S"]] = raw_volume.get(r["S"], 0) + r["s"]
+
+    result = replay(stream, args.interval_ms / 1000, watched, aggregate_trades=True)
+
+    print(f"{args.symbols} symbols x {args.rate:g} records/s for {args.seconds:g}s "
+          f"({raw_records:,} records), client watches {args.per_client}, interval {args.interval_ms} ms")
+    print(f"{'':14s} {'redis writes':>14s} {'ws frames':>12s} {'ws records':>12s}")
+    print(f"{'per message':14s} {len(stream):>14,} {sum(1 for n in raw_ws if n):>12,} {sum(raw_ws):>12,}")
+    print(f"{'conflated':14s} {result['writes']:>14,} {result['ws_frames']:>12,} {result['ws_records']:>12,}")
+    print(f"redis writes: {len(stream) / max(result['writes'], 1):.1f}x fewer, "
+          f"ws frames: {sum(1 for n in raw_ws if n) / max(result['ws_frames'], 1):.1f}x fewer")
+    same = result["latest"] == raw_latest and result["volume"] == raw_volume
+    print(f"latest quotes and total volume identical: {same}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""
+10-K HTML 转文本基准: lxml 流式路径 vs BeautifulSoup 路径
+
+用法:
+    python scripts/bench_filing_text.py                 # 用 documents/sec_filing_combined.txt 合成 inline XBRL 文件
+    python scripts/bench_filing_text.py filing.htm      # 使用真实的 10-K HTML
+    python scripts/bench_filing_text.py --repeat 5
+"""
+import argparse
+import html
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from filing_text import etree, html_to_text_bs4, html_to_text_lxml  # noqa: E402
+
+SAMPLE_TEXT = Path(__file__).resolve().parent.parent / "documents" / "sec_filing_combined.txt"
+
+
+def synthesize_filing(text: str) -> bytes:
+    """把纯文本包装成结构类似 EDGAR inline XBRL 的 HTML (隐藏头、span 嵌套、数值标签)"""
+    parts = [
+        "<?xml version='1.0' encoding='ASCII'?>\n",
+        '<html xmlns="http://www.w3.org/1999/xhtml" xmlns:ix="http://www.xbrl.org/2013/inlineXBRL">',
+        "<head><title>10-K</title><style>td { padding: 0 }</style></head><body>",
+        '<div style="display:none"><ix:header><ix:hidden>',
+        "<ix:nonnumeric name='dei:AmendmentFlag'>false</ix:nonnumeric>",
+        "</ix:hidden><ix:resources>us-gaap:Revenue</ix:resources></ix:header></div>",
+    ]
+    for i, paragraph in enumerate(text.split("\n\n")):
+        lines = [html.escape(line) for line in paragraph.split("\n") if line.strip()]
+        if not lines:
+            continue
+        spans = "".join(
+            f'<span style="color:#000000;font-family:Arial;font-size:10pt">{line}</span>'
+            for line in lines
+        )
+        if i % 7 == 0:
+            # 财务表格里的数值事实
+            spans += (
+                '<table><tr><td><span>Revenue</span></td><td>$</td><td>'
+                f'<ix:nonfraction name="us-gaap:Revenues" contextref="c-{i}" unitref="usd" '
+                f'decimals="-6" scale="6">{i * 1000:,}</ix:nonfraction></td></tr></table>'
+            )
+        parts.append(f'<div style="margin-top:6pt"><ix:continuation id="c{i}">{spans}</ix:continuation></div>\n')
+    parts.append("</body></html>")
+    return "".join(parts).encode("ascii", "xmlcharrefreplace")
+
+
+def bench(fn, content: bytes, repeat: int) -> tuple[float, str]:
+    timings = []
+    result = ""
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn(content)
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("path", nargs="?", help="10-K HTML file (default: synthesized from the bundled sample)")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    if etree is None:
+        sys.exit("lxml is not installed")
+
+    if args.path:
+        content = Path(args.path).read_bytes()
+    else:
+        content = synthesize_filing(SAMPLE_TEXT.read_text(encoding="utf-8"))
+    print(f"input: {len(content) / 1e6:.1f} MB")
+
+    bs4_time, bs4_text = bench(html_to_text_bs4, content, args.repeat)
+    lxml_time, lxml_text = bench(html_to_text_lxml, content, args.repeat)
+
+    print(f"BeautifulSoup: {bs4_time * 1000:8.1f} ms  ({len(bs4_text):,} chars)")
+    print(f"lxml stream:   {lxml_time * 1000:8.1f} ms  ({len(lxml_text):,} chars)")
+    print(f"speedup:       {bs4_time / lxml_time:8.1f}x")
+    print(f"same output:   {bs4_text.rstrip() == lxml_text.rstrip()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""
+实时行情 fan-out 基准: 广播给所有连接 vs 按 symbol 订阅索引投递
+
+模拟 N 个客户端 (默认 1000)，每个订阅 K 个 symbol (从 S 个中随机抽取)，
+回放 Alpaca 风格的消息帧 (每帧若干条 trade / quote)，统计每帧 CPU 耗时、
+发送的 WebSocket 帧数和字节数。
+
+用法:
+    python scripts/bench_realtime_fanout.py
+    python scripts/bench_realtime_fanout.py --clients 1000 --symbols 500 --per-client 5 --frames 2000
+"""
+import argparse
+import asyncio
+import json
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from subscriptions import SubscriptionIndex  # noqa: E402
+
+
+class FakeClient:
+    """WebSocket 替身: 只做 UTF-8 编码 (真实发送的最低成本) 并统计发送量"""
+
+    def __init__(self):
+        self.frames = 0
+        self.bytes = 0
+
+    async def send_text(self, message: str):
+        self.frames += 1
+        self.bytes += len(message.encode("utf-8"))
+
+
+def make_frames(symbols: list[str], count: int, rng: random.Random) -> list[list[dict]]:
+    frames = []
+    for _ in range(count):
+        frame = []
+        for _ in range(rng.randint(1, 20)):
+            symbol = rng.choice(symbols)
+            price = round(rng.uniform(10, 500), 2)
+            if rng.random() < 0.7:
+                frame.append({"T": "q", "S": symbol, "bp": price, "bs": 1, "ap": price + 0.01, "as": 2,
+                              "t": "2024-01-02T15:30:00.123456Z", "c": ["R"], "z": "C"})
+            else:
+                frame.append({"T": "t", "S": symbol, "i": rng.randint(1, 10**9), "p": price, "s": 100,
+                              "t": "2024-01-02T15:30:00.123456Z", "c": ["@"], "z": "C"})
+        frames.append(frame)
+    return frames
+
+
+async def broadcast_all(clients: list[FakeClient], frame: list[dict]):
+    """旧实现: 每帧序列化一次，发给所有连接"""
+    message = json.dumps(frame)
+    for client in clients:
+        await client.send_text(message)
+
+
+async def broadcast_routed(index: SubscriptionIndex, frame: list[dict]):
+    """新实现: 只发给订阅了相关 symbol 的连接"""
+    for client, message, _ in index.route(frame):
+        await client.send_text(message)
+
+
+async def run(fn, frames, clients) -> dict:
+    for client in clients:
+        client.frames = client.bytes = 0
+    start = time.perf_counter()
+    for frame in frames:
+        await fn(frame)
+    elapsed = time.perf_counter() - start
+    return {
+        "us_per_frame": elapsed / len(frames) * 1e6,
+        "ws_frames": sum(c.frames for c in clients),
+        "mbytes": sum(c.bytes for c in clients) / 1e6,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clients", type=int, default=1000)
+    parser.add_argument("--symbols", type=int, default=500)
+    parser.add_argument("--per-client", type=int, default=5)
+    parser.add_argument("--frames", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    symbols = [f"SYM{i:03d}" for i in range(args.symbols)]
+    clients = [FakeClient() for _ in range(args.clients)]
+
+    index = SubscriptionIndex()
+    for client in clients:
+        index.subscribe(client, rng.sample(symbols, args.per_client))
+    frames = make_frames(symbols, args.frames, rng)
+
+    print(f"{args.clients} clients x {args.per_client} symbols (of {args.symbols}), {args.frames} frames")
+    results = {
+        "broadcast to all": asyncio.run(run(lambda f: broadcast_all(clients, f), frames, clients)),
+        "symbol index": asyncio.run(run(lambda f: broadcast_routed(index, f), frames, clients)),
+    }
+    for name, r in results.items():
+        print(f"{name:18s} {r['us_per_frame']:10.1f} us/frame  {r['ws_frames']:>10,} ws frames  {r['mbytes']:10.1f} MB")
+
+    base, routed = results["broadcast to all"], results["symbol index"]
+    print(f"CPU per frame: {base['us_per_frame'] / routed['us_per_frame']:.1f}x less, "
+          f"bytes sent: {base['mbytes'] / max(routed['mbytes'], 1e-9):.1f}x less")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+"""
+自选股 10-K 后台预取
+
+定期遍历所有用户自选股 (Watchlist.symbols)，在后台下载最新 10-K、
+生成章节索引并构建 FAISS 索引，让交互式的 SEC 提问总是命中热缓存。
+10-K 的新鲜度检查由 download_and_cache_filing 负责，重复运行的开销很小。
+"""
+import asyncio
+import logging
+import time
+
+from sqlalchemy import select
+
+from config import get_settings
+from database import async_session_maker
+from executor import get_executor
+from models import Watchlist
+
+logger = logging.getLogger(__name__)
+
+
+async def watched_symbols() -> list[str]:
+    """所有自选股列表中出现过的股票代码 (去重)"""
+    async with async_session_maker() as session:
+        result = await session.execute(select(Watchlist.symbols))
+        rows = result.scalars().all()
+    return sorted({s.strip().upper() for row in rows if row for s in row.split(",") if s.strip()})
+
+
+class SECPrefetcher:
+    """后台预取任务 (使用 get_sec_prefetcher() 获取单例)"""
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self.tickers: dict[str, dict] = {}  # 每个 ticker 的预取状态
+        self.last_run: dict | None = None
+        self._task: asyncio.Task | None = None
+        self._inflight: dict[str, asyncio.Task] = {}
+        self._manual_run: asyncio.Task | None = None
+        # 同时提交到 "sec" 线程池的任务数不超过其线程数，
+        # 否则排队时间也会计入线程池超时，冷启动时靠后的 ticker 还没开始就超时
+        self._slots = asyncio.Semaphore(get_executor("sec").max_workers)
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self):
+        if not self.running:
+            self._task = asyncio.create_task(self._run_forever())
+
+    async def stop(self):
+        tasks = [t for t in [self._task, self._manual_run, *self._inflight.values()] if t is not None]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._task = None
+
+    async def _run_forever(self):
+        while True:
+            try:
+                await self.run_once()
+            except Exception as e:
+                logger.exception(f"SEC prefetch run failed: {e}")
+            await asyncio.sleep(self.interval)
+
+    async def run_once(self):
+        """预取所有自选股 (已在进行中的 ticker 不会重复执行)"""
+        started_at = time.time()
+        symbols = await watched_symbols()
+        await asyncio.gather(*(self.prefetch(symbol) for symbol in symbols))
+        self.last_run = {
+            "started_at": started_at,
+            "finished_at": time.time(),
+            "symbols": len(symbols),
+        }
+        logger.info(f"📥 SEC prefetch finished for {len(symbols)} symbols")
+
+    def trigger(self) -> bool:
+        """立即执行一次完整预取，已有手动运行未结束时返回 False"""
+        if self._manual_run is not None and not self._manual_run.done():
+            return False
+        self._manual_run = asyncio.create_task(self.run_once())
+        return True
+
+    def prefetch(self, ticker: str) -> asyncio.Task:
+        """预取单个 ticker，同一 ticker 同时只有一个任务"""
+        ticker = ticker.upper()
+        task = self._inflight.get(ticker)
+        if task is None:
+            task = asyncio.create_task(self._prefetch(ticker))
+            self._inflight[ticker] = task
+            task.add_done_callback(lambda _: self._inflight.pop(ticker, None))
+        return task
+
+    def schedule(self, symbols: list[str]):
+        """自选股变更时立即预取新加入的代码 (后台未启动时忽略)"""
+        if not self.running:
+            return
+        for symbol in symbols:
+            if self.tickers.get(symbol.upper(), {}).get("state") != "ready":
+                self.prefetch(symbol)
+
+    async def _prefetch(self, ticker: str):
+        from tools.get_sec_filing import prefetch_filing
+
+        status = self.tickers.setdefault(ticker, {})
+        status.update(state="queued")
+        try:
+            async with self._slots:
+                status.update(state="running", started_at=time.time())
+                result = await get_executor("sec").run(prefetch_filing, ticker)
+        except asyncio.TimeoutError:
+            status.update(state="error", error="timeout")
+        except ValueError as e:
+            # 不在 SEC 数据库中 / 没有 10-K (ETF、指数、海外股票)
+            status.update(state="unavailable", error=str(e))
+        except Exception as e:
+            logger.warning(f"SEC prefetch failed for {ticker}: {e}")
+            status.update(state="error", error=str(e))
+        else:
+            status.update(state="ready", error=None, **result)
+        finally:
+            status["updated_at"] = time.time()
+
+    def status(self) -> dict:
+        states: dict[str, int] = {}
+        for entry in self.tickers.values():
+            states[entry["state"]] = states.get(entry["state"], 0) + 1
+        return {
+            "running": self.running,
+            "interval_seconds": self.interval,
+            "last_run": self.last_run,
+            "in_progress": sorted(self._inflight),
+            "states": states,
+            "tickers": self.tickers,
+        }
+
+
+_prefetcher: SECPrefetcher | None = None
+
+
+def get_sec_prefetcher() -> SECPrefetcher:
+    """进程级共享的预取任务"""
+    global _prefetcher
+    if _prefetcher is None:
+        _prefetcher = SECPrefetcher(interval=get_settings().sec_prefetch_interval_minutes * 60)
+    return _prefetcher
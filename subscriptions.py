@@ -0,0 +1,189 @@
+"""
+实时行情订阅索引
+
+维护 symbol → 订阅者 和 订阅者 → symbols 两个方向的索引，
+每条 Alpaca 消息只投递给订阅了该 symbol 的客户端。
+订阅 / 退订 / 断开时返回本进程内 0→1、1→0 变化的 symbol，
+本 worker 的上游 (Alpaca) 订阅 / 退订据此进行。
+
+SymbolRefCounts 把每个 worker 的订阅登记到 Redis (带过期)，用于跨 worker 统计。
+"""
+import asyncio
+import json
+import logging
+from collections import defaultdict
+from typing import Any, Hashable, Iterable
+
+logger = logging.getLogger(__name__)
+
+
+class SubscriptionIndex:
+    """symbol ↔ 客户端 双向索引 (客户端可以是任意可哈希对象，如 WebSocket)"""
+
+    def __init__(self):
+        self._by_symbol: dict[str, set[Hashable]] = {}
+        self._by_client: dict[Hashable, set[str]] = {}
+
+    def subscribe(self, client: Hashable, symbols: Iterable[str]) -> list[str]:
+        """订阅，返回此前无人订阅的 symbol"""
+        watched = self._by_client.setdefault(client, set())
+        added = []
+        for symbol in symbols:
+            if symbol in watched:
+                continue
+            watched.add(symbol)
+            subscribers = self._by_symbol.get(symbol)
+            if subscribers is None:
+                subscribers = self._by_symbol[symbol] = set()
+                added.append(symbol)
+            subscribers.add(client)
+        return added
+
+    def unsubscribe(self, client: Hashable, symbols: Iterable[str]) -> list[str]:
+        """退订，返回此后无人订阅的 symbol"""
+        watched = self._by_client.get(client)
+        if not watched:
+            return []
+        removed = []
+        for symbol in symbols:
+            if symbol not in watched:
+                continue
+            watched.discard(symbol)
+            subscribers = self._by_symbol[symbol]
+            subscribers.discard(client)
+            if not subscribers:
+                del self._by_symbol[symbol]
+                removed.append(symbol)
+        return removed
+
+    def remove_client(self, client: Hashable) -> list[str]:
+        """客户端断开: 退订其全部 symbol"""
+        removed = self.unsubscribe(client, list(self._by_client.get(client, ())))
+        self._by_client.pop(client, None)
+        return removed
+
+    def subscribers(self, symbol: str) -> set[Hashable]:
+        return self._by_symbol.get(symbol, set())
+
+    def symbols_of(self, client: Hashable) -> set[str]:
+        return self._by_client.get(client, set())
+
+    @property
+    def symbols(self) -> list[str]:
+        """当前至少有一个订阅者的 symbol"""
+        return list(self._by_symbol)
+
+    def route(self, records: list[dict]) -> list[tuple[Hashable, str, dict[str, str]]]:
+        """
+        把一帧 Alpaca 记录按 symbol ("S") 拆分，返回
+        (客户端, 该客户端的 JSON 数组, symbol → 该 symbol 记录的 JSON 片段)。
+        没有 symbol 的控制消息不下发。每条记录只序列化一次，
+        订阅集合相同的客户端共用同一个 payload 和片段字典 (只读)。
+        """
+        by_symbol: dict[str, list[str]] = defaultdict(list)
+        for record in records:
+            symbol = record.get("S") if isinstance(record, dict) else None
+            if symbol in self._by_symbol:
+                by_symbol[symbol].append(json.dumps(record))
+        if not by_symbol:
+            return []
+
+        # 每个客户端在这一帧里关心的 symbol
+        buckets: dict[Hashable, list[str]] = defaultdict(list)
+        for symbol in by_symbol:
+            for client in self._by_symbol[symbol]:
+                buckets[client].append(symbol)
+
+        fragments = {symbol: ", ".join(items) for symbol, items in by_symbol.items()}
+        payloads: dict[tuple[str, ...], tuple[str, dict[str, str]]] = {}
+        deliveries = []
+        for client, symbols in buckets.items():
+            key = tuple(symbols)
+            payload = payloads.get(key)
+            if payload is None:
+                parts = {symbol: fragments[symbol] for symbol in symbols}
+                payload = payloads[key] = ("[" + ", ".join(parts.values()) + "]", parts)
+            deliveries.append((client, *payload))
+        return deliveries
+
+    def stats(self) -> dict:
+        return {
+            "clients": len(self._by_client),
+            "symbols": len(self._by_symbol),
+            "subscriptions": sum(len(s) for s in self._by_client.values()),
+        }
+
+
+class SymbolRefCounts:
+    """
+    跨 worker 的 symbol 订阅登记
+
+    每个 worker 只登记自己 (本进程) 正在订阅的 symbol: Redis 集合 {prefix}:{worker_id}，
+    带过期时间，由 keep_alive() 定期续期 (并重写为本地的完整集合)。
+    worker 崩溃后其登记在 ttl 秒后自动消失，启动时 reset() 清掉同名 worker 的旧登记，
+    不会留下永远大于 0 的计数。counts() 汇总存活 worker 的登记: symbol → worker 数。
+
+    上游 (Alpaca) 订阅由每个 worker 自己的本地 0→1 / 1→0 决定 (见 SubscriptionIndex)，
+    不依赖这里的计数。redis 为 None 时只有进程内登记。
+    """
+
+    def __init__(self, redis: Any | None, prefix: str, worker_id: str, ttl: int = 60):
+        self.redis = redis
+        self.prefix = prefix
+        self.key = f"{prefix}:{worker_id}"
+        self.ttl = ttl
+        self._local: set[str] = set()
+
+    async def reset(self):
+        """清除本 worker 之前 (同一 worker_id 崩溃前) 的登记"""
+        self._local.clear()
+        if self.redis is not None:
+            await self.redis.delete(self.key)
+
+    async def acquire(self, symbols: list[str]):
+        """登记本 worker 新订阅的 symbol"""
+        if not symbols:
+            return
+        self._local.update(symbols)
+        if self.redis is not None:
+            async with self.redis.pipeline(transaction=False) as pipe:
+                pipe.sadd(self.key, *symbols)
+                pipe.expire(self.key, self.ttl)
+                await pipe.execute()
+
+    async def release(self, symbols: list[str]):
+        """取消登记本 worker 不再订阅的 symbol"""
+        if not symbols:
+            return
+        self._local.difference_update(symbols)
+        if self.redis is not None:
+            await self.redis.srem(self.key, *symbols)
+
+    async def heartbeat(self):
+        """用本地集合重写登记并续期 (Redis 曾丢失数据时也能恢复)"""
+        if self.redis is None:
+            return
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.delete(self.key)
+            if self._local:
+                pipe.sadd(self.key, *self._local)
+                pipe.expire(self.key, self.ttl)
+            await pipe.execute()
+
+    async def keep_alive(self):
+        """后台任务: 每 ttl/3 秒 heartbeat 一次"""
+        while True:
+            try:
+                await self.heartbeat()
+            except Exception as e:
+                logger.warning(f"Symbol registry heartbeat failed: {e}")
+            await asyncio.sleep(self.ttl / 3)
+
+    async def counts(self) -> dict[str, int]:
+        if self.redis is None:
+            return {symbol: 1 for symbol in self._local}
+        counts: dict[str, int] = {}
+        async for key in self.redis.scan_iter(match=f"{self.prefix}:*"):
+            for symbol in await self.redis.smembers(key):
+                counts[symbol] = counts.get(symbol, 0) + 1
+        return counts
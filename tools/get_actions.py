@@ -2,7 +2,8 @@ from langchain_core.tools import tool
 from typing import Optional
 from pydantic import BaseModel, Field
 from enum import Enum
-import yfinance as yf
+from market_data import get_attribute
+from .serialization import compact_frame
 
 
 # Define an enum for the type of action to fetch
@@ -22,13 +23,11 @@ class ActionInput(BaseModel):
 def get_stock_actions(ticker: str, action_type: ActionType):
     """Fetch stock actions such as dividends, splits, or both for a given ticker symbol."""
     
-    stock = yf.Ticker(ticker)
-    
     if action_type == ActionType.actions:
-        return stock.actions.to_dict()
+        return compact_frame(get_attribute(ticker, "actions", "actions"), "get_stock_actions", keep="tail")
     elif action_type == ActionType.dividends:
-        return stock.dividends.to_dict()
+        return compact_frame(get_attribute(ticker, "actions", "dividends"), "get_stock_actions", keep="tail")
     elif action_type == ActionType.splits:
-        return stock.splits.to_dict()
+        return compact_frame(get_attribute(ticker, "actions", "splits"), "get_stock_actions", keep="tail")
     
     return {"error": "Invalid action type selected."}
@@ -1,7 +1,7 @@
 # Description: A tool to fetch comprehensive stock analysis data
 from langchain_core.tools import tool
 from pydantic import BaseModel, Field
-import yfinance as yf
+from market_data import get_info
 
 
 class StockAnalysisInput(BaseModel):
@@ -16,8 +16,7 @@ def get_stock_analysis(ticker: str) -> dict:
     Use this tool when user asks for stock analysis, valuation, or financial ratios.
     """
     try:
-        stock = yf.Ticker(ticker)
-        info = stock.info
+        info = get_info(ticker)
         
         if not info or info.get("regularMarketPrice") is None:
             return {"error": f"Unable to fetch data for {ticker}"}
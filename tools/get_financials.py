@@ -1,7 +1,8 @@
 from langchain_core.tools import tool
 from pydantic import BaseModel, Field
 from enum import Enum
-import yfinance as yf
+from market_data import get_attribute
+from .serialization import compact_frame
 
 
 # Define an enum for the type of financial statement
@@ -24,20 +25,18 @@ class FinancialsInput(BaseModel):
 def get_financials(ticker: str, financial_type: FinancialType):
     """Fetch the specified financial statement for a given ticker symbol."""
     
-    stock = yf.Ticker(ticker)
-    
     # Fetch the appropriate financial statement based on the input
     if financial_type == FinancialType.income_stmt:
-        return stock.income_stmt.to_dict()
+        return compact_frame(get_attribute(ticker, "statements", "income_stmt"), "get_financials")
     elif financial_type == FinancialType.quarterly_income_stmt:
-        return stock.quarterly_income_stmt.to_dict()
+        return compact_frame(get_attribute(ticker, "statements", "quarterly_income_stmt"), "get_financials")
     elif financial_type == FinancialType.balance_sheet:
-        return stock.balance_sheet.to_dict()
+        return compact_frame(get_attribute(ticker, "statements", "balance_sheet"), "get_financials")
     elif financial_type == FinancialType.quarterly_balance_sheet:
-        return stock.quarterly_balance_sheet.to_dict()
+        return compact_frame(get_attribute(ticker, "statements", "quarterly_balance_sheet"), "get_financials")
     elif financial_type == FinancialType.cashflow:
-        return stock.cashflow.to_dict()
+        return compact_frame(get_attribute(ticker, "statements", "cashflow"), "get_financials")
     elif financial_type == FinancialType.quarterly_cashflow:
-        return stock.quarterly_cashflow.to_dict()
+        return compact_frame(get_attribute(ticker, "statements", "quarterly_cashflow"), "get_financials")
     
     return {"error": "Invalid financial type selected."}
@@ -2,7 +2,8 @@ from langchain_core.tools import tool
 from typing import Optional
 from pydantic import BaseModel, Field
 from enum import Enum
-import yfinance as yf
+from market_data import get_history
+from .serialization import compact_frame
 
 # Define the Enum for valid periods
 class PeriodEnum(str, Enum):
@@ -27,10 +28,7 @@ class HistoricalDataInput(BaseModel):
 def get_historical_data(ticker: str, period: str = "1mo") -> dict:
     """Fetch historical market data for a given ticker symbol and period."""
     
-    stock = yf.Ticker(ticker)
-    history = stock.history(period=period)
+    history = get_history(ticker, period)
     
-    # Convert the DataFrame to a dictionary for easy serialization
-    history_dict = history.to_dict(orient='index')
-    
-    return history_dict
\ No newline at end of file
+    # Compact CSV (most recent rows kept if over the token budget)
+    return compact_frame(history, "get_historical_data", keep="tail", drop_zero_columns=True)
@@ -1,7 +1,8 @@
 from langchain_core.tools import tool
 from pydantic import BaseModel, Field
 from enum import Enum
-import yfinance as yf
+from market_data import get_attribute
+from .serialization import compact_frame
 
 # Define an enum for the type of holders' information
 class HolderType(str, Enum):
@@ -22,22 +23,20 @@ class HoldersInput(BaseModel):
 def get_holders_info(ticker: str, holder_type: HolderType):
     """Fetch the specified holders' information or sustainability metrics for a given ticker symbol."""
     
-    stock = yf.Ticker(ticker)
-    
     # Fetch the appropriate holders' information based on the input
     if holder_type == HolderType.major_holders:
-        return stock.major_holders.to_dict()
+        return compact_frame(get_attribute(ticker, "holders", "major_holders"), "get_holders_info")
     elif holder_type == HolderType.institutional_holders:
-        return stock.institutional_holders.to_dict()
+        return compact_frame(get_attribute(ticker, "holders", "institutional_holders"), "get_holders_info")
     elif holder_type == HolderType.mutualfund_holders:
-        return stock.mutualfund_holders.to_dict()
+        return compact_frame(get_attribute(ticker, "holders", "mutualfund_holders"), "get_holders_info")
     elif holder_type == HolderType.insider_transactions:
-        return stock.insider_transactions.to_dict()
+        return compact_frame(get_attribute(ticker, "holders", "insider_transactions"), "get_holders_info")
     elif holder_type == HolderType.insider_purchases:
-        return stock.insider_purchases.to_dict()
+        return compact_frame(get_attribute(ticker, "holders", "insider_purchases"), "get_holders_info")
     elif holder_type == HolderType.insider_roster_holders:
-        return stock.insider_roster_holders.to_dict()
+        return compact_frame(get_attribute(ticker, "holders", "insider_roster_holders"), "get_holders_info")
     elif holder_type == HolderType.sustainability:
-        return stock.sustainability.to_dict()
+        return compact_frame(get_attribute(ticker, "holders", "sustainability"), "get_holders_info")
     
     return {"error": "Invalid holder type selected."}
@@ -1,6 +1,6 @@
 from langchain_core.tools import tool
 from pydantic import BaseModel, Field
-import yfinance as yf
+from market_data import get_news
 
 # Define the input schema
 class NewsInput(BaseModel):
@@ -10,7 +10,6 @@ class NewsInput(BaseModel):
 def get_stock_news(ticker: str):
     """Fetch the latest news articles for a given ticker symbol."""
     
-    stock = yf.Ticker(ticker)
-    news = stock.news
+    news = get_news(ticker)
     
     return news
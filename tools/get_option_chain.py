@@ -1,6 +1,7 @@
 from langchain_core.tools import tool
 from pydantic import BaseModel, Field
-import yfinance as yf
+from market_data import get_options, get_option_chain as fetch_option_chain
+from .serialization import compact_frame
 
 
 # Define the input schema
@@ -9,25 +10,38 @@ class OptionChainInput(BaseModel):
     expiration_date: str = Field(..., description="The expiration date for the options chain (format: 'YYYY-MM-DD')")
 
 
+# Columns that add tokens without helping the analysis
+DROP_COLUMNS = ["contractSymbol", "lastTradeDate", "contractSize", "currency"]
+
+
+def _compact_chain(chain):
+    """Compact one side of the chain, keeping strikes around the money if over budget."""
+    chain = chain.drop(columns=DROP_COLUMNS, errors="ignore").set_index("strike")
+    
+    # Rows are sorted by strike; the in-the-money flag flips at the current price
+    center = None
+    if "inTheMoney" in chain.columns and len(chain):
+        flips = (chain["inTheMoney"] != chain["inTheMoney"].shift()).to_numpy().nonzero()[0]
+        center = int(flips[-1]) if len(flips) else len(chain) // 2
+    
+    return compact_frame(chain, "get_option_chain", keep="center", center=center)
+
+
 @tool(args_schema=OptionChainInput)
 def get_option_chain(ticker: str, expiration_date: str):
     """Fetch the options chain for a given ticker symbol and expiration date."""
     
-    stock = yf.Ticker(ticker)
-    
     # Check if the expiration date is valid
-    if expiration_date not in stock.options:
+    if expiration_date not in get_options(ticker):
         return {"error": f"No options available for the date {expiration_date}. Please choose a valid expiration date."}
     
     # If the date is valid, fetch the option chain
     try:
-        option_chain = stock.option_chain(expiration_date)
-        calls_dict = option_chain.calls.to_dict(orient='index')
-        puts_dict = option_chain.puts.to_dict(orient='index')
+        option_chain = fetch_option_chain(ticker, expiration_date)
         
         return {
-            "calls": calls_dict,
-            "puts": puts_dict
+            "calls": _compact_chain(option_chain.calls),
+            "puts": _compact_chain(option_chain.puts)
         }
     
     except Exception as e:
@@ -1,6 +1,6 @@
 from pydantic import BaseModel, Field
 from langchain_core.tools import tool
-import yfinance as yf
+from market_data import get_options
 
 
 # Define the input schema
@@ -12,7 +12,6 @@ class OptionsInput(BaseModel):
 def get_options_expiration_dates(ticker: str):
     """Fetch the available options expiration dates for a given ticker symbol."""
     
-    stock = yf.Ticker(ticker)
-    options_dates = stock.options
+    options_dates = get_options(ticker)
     
     return {"options_expiration_dates": options_dates}
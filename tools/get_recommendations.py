@@ -1,7 +1,8 @@
 from langchain_core.tools import tool
 from pydantic import BaseModel, Field
 from enum import Enum
-import yfinance as yf
+from market_data import get_attribute
+from .serialization import compact_frame
 
 # Define an enum for the type of recommendation information
 class RecommendationType(str, Enum):
@@ -18,14 +19,12 @@ class RecommendationsInput(BaseModel):
 def get_recommendations(ticker: str, recommendation_type: RecommendationType):
     """Fetch the specified recommendation information for a given ticker symbol."""
     
-    stock = yf.Ticker(ticker)
-    
     # Fetch the appropriate recommendation information based on the input
     if recommendation_type == RecommendationType.recommendations:
-        return stock.recommendations.to_dict()
+        return compact_frame(get_attribute(ticker, "recommendations", "recommendations"), "get_recommendations")
     elif recommendation_type == RecommendationType.recommendations_summary:
-        return stock.recommendations_summary.to_dict()
+        return compact_frame(get_attribute(ticker, "recommendations", "recommendations_summary"), "get_recommendations")
     elif recommendation_type == RecommendationType.upgrades_downgrades:
-        return stock.upgrades_downgrades.to_dict()
+        return compact_frame(get_attribute(ticker, "recommendations", "upgrades_downgrades"), "get_recommendations")
     
     return {"error": "Invalid recommendation type selected."}
@@ -3,15 +3,52 @@ from langchain_core.tools import tool
 from pydantic import BaseModel, Field
 from typing import Literal
 from pathlib import Path
-import requests
+import httpx
 import re
+import os
+import json
+import time
+import bisect
 import logging
+import threading
+
+from config import get_settings
+from edgar_client import get_edgar_client
+from filing_text import html_to_text
 
 logger = logging.getLogger(__name__)
 
 # Cache directory for downloaded SEC filings
 SEC_CACHE_DIR = Path(__file__).parent.parent / "documents" / "sec_cache"
 
+# Ticker -> CIK index persisted from SEC's company_tickers.json
+TICKER_MAP_URL = "https://www.sec.gov/files/company_tickers.json"
+TICKER_MAP_FILE = SEC_CACHE_DIR / "ticker_cik_map.json"
+
+_ticker_index: dict[str, str] | None = None
+_ticker_index_lock = threading.Lock()
+_refresh_thread: threading.Thread | None = None
+
+# 10-K items in filing order, and the item each extractable section maps to
+ITEM_ORDER = [
+    "1", "1A", "1B", "1C", "2", "3", "4", "5", "6", "7", "7A", "8",
+    "9", "9A", "9B", "9C", "10", "11", "12", "13", "14", "15", "16",
+]
+SECTION_ITEMS = {
+    "business": "1",
+    "risk_factors": "1A",
+    "cybersecurity": "1C",
+    "legal": "3",
+    "mda": "7",
+    "executives": "10",
+    "compensation": "11",
+}
+# "Item 1A", "ITEM 7.", "Item 9B, 9C, 10" (page headers) at the start of a line
+ITEM_HEADING = re.compile(r"^[ \t]*item[ \t\xa0]*(\d{1,2}[A-C]?)\b", re.IGNORECASE | re.MULTILINE)
+
+# In-memory copy of the section sidecars: {ticker: {"source", "length", "sections"}}
+_section_indexes: dict[str, dict] = {}
+
 
 class SECFilingInput(BaseModel):
     ticker: str = Field(..., description="The ticker symbol of the company")
@@ -38,27 +75,99 @@ class SECFilingInput(BaseModel):
     )
 
 
-def get_company_cik(ticker: str) -> str:
-    """Get CIK number from ticker"""
-    url = "https://www.sec.gov/files/company_tickers.json"
-    headers = {"User-Agent": "YahooFinanceAgent research@example.com"}
+def download_ticker_map() -> dict[str, str]:
+    """Download SEC's ticker list, persist it as a {TICKER: CIK} index and return it"""
+    global _ticker_index
     
-    response = requests.get(url, headers=headers)
-    data = response.json()
+    response = get_edgar_client().get(TICKER_MAP_URL, timeout=30)
+    response.raise_for_status()
+    
+    index = {
+        entry["ticker"].upper(): str(entry["cik_str"]).zfill(10)
+        for entry in response.json().values()
+    }
     
-    for entry in data.values():
-        if entry["ticker"].upper() == ticker.upper():
-            return str(entry["cik_str"]).zfill(10)
+    # Write atomically so concurrent readers never see a partial file
+    SEC_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    tmp = TICKER_MAP_FILE.with_suffix(".tmp")
+    tmp.write_text(json.dumps(index), encoding="utf-8")
+    os.replace(tmp, TICKER_MAP_FILE)
     
-    return None
+    _ticker_index = index
+    logger.info(f"🗂️ Refreshed SEC ticker map ({len(index):,} tickers)")
+    return index
 
 
-def get_latest_10k_url(cik: str) -> str:
-    """Get the URL of the latest 10-K filing"""
+def _refresh_ticker_map_in_background():
+    """Refresh the persisted ticker map without blocking the caller (at most one refresh at a time)"""
+    global _refresh_thread
+    
+    def refresh():
+        try:
+            download_ticker_map()
+        except Exception as e:
+            logger.warning(f"SEC ticker map refresh failed: {e}")
+    
+    with _ticker_index_lock:
+        if _refresh_thread is not None and _refresh_thread.is_alive():
+            return
+        _refresh_thread = threading.Thread(target=refresh, name="sec-ticker-map", daemon=True)
+        _refresh_thread.start()
+
+
+def get_ticker_index() -> dict[str, str]:
+    """
+    Ticker -> CIK index, loaded once per process from the on-disk copy.
+    Downloads synchronously only if there is no copy yet; a stale copy is
+    served as-is while a background refresh runs.
+    """
+    global _ticker_index
+    
+    if _ticker_index is None:
+        with _ticker_index_lock:
+            if _ticker_index is None and TICKER_MAP_FILE.exists():
+                _ticker_index = json.loads(TICKER_MAP_FILE.read_text(encoding="utf-8"))
+        if _ticker_index is None:
+            return download_ticker_map()
+    
+    max_age = get_settings().sec_ticker_map_refresh_hours * 3600
+    try:
+        age = time.time() - TICKER_MAP_FILE.stat().st_mtime
+    except FileNotFoundError:
+        age = max_age
+    if age >= max_age:
+        _refresh_ticker_map_in_background()
+    
+    return _ticker_index
+
+
+def get_company_cik(ticker: str) -> str:
+    """Get CIK number from ticker"""
+    return get_ticker_index().get(ticker.upper())
+
+
+def check_latest_10k(cik: str, etag: str | None = None, last_modified: str | None = None) -> dict | None:
+    """
+    Look up the latest 10-K in the company's submissions feed.
+    Sends a conditional GET when validators from a previous check are given.
+    Returns {"not_modified": True, ...} on HTTP 304, the filing info otherwise,
+    or None if the company has no 10-K.
+    """
     url = f"https://data.sec.gov/submissions/CIK{cik}.json"
-    headers = {"User-Agent": "YahooFinanceAgent research@example.com"}
+    headers = {}
+    if etag:
+        headers["If-None-Match"] = etag
+    if last_modified:
+        headers["If-Modified-Since"] = last_modified
+    
+    response = get_edgar_client().get(url, headers=headers, timeout=30)
+    validators = {
+        "etag": response.headers.get("ETag", etag),
+        "last_modified": response.headers.get("Last-Modified", last_modified),
+    }
+    if response.status_code == 304:
+        return {"not_modified": True, **validators}
     
-    response = requests.get(url, headers=headers)
     data = response.json()
     
     filings = data.get("filings", {}).get("recent", {})
@@ -70,13 +179,125 @@ def get_latest_10k_url(cik: str) -> str:
         if form == "10-K":
             accession = accessions[i].replace("-", "")
             doc = primary_docs[i]
-            return f"https://www.sec.gov/Archives/edgar/data/{cik.lstrip('0')}/{accession}/{doc}"
+            return {
+                "not_modified": False,
+                "url": f"https://www.sec.gov/Archives/edgar/data/{cik.lstrip('0')}/{accession}/{doc}",
+                "accession": accessions[i],
+                **validators,
+            }
     
     return None
 
 
-def extract_section(text: str, section: str, detail_level: str = "summary") -> str:
-    """Extract a specific section from 10-K text with configurable detail level"""
+def get_latest_10k_url(cik: str) -> str:
+    """Get the URL of the latest 10-K filing"""
+    latest = check_latest_10k(cik)
+    return latest["url"] if latest else None
+
+
+def _filing_meta_file(ticker: str) -> Path:
+    return SEC_CACHE_DIR / f"{ticker.upper()}_10k.meta.json"
+
+
+def read_filing_meta(ticker: str) -> dict | None:
+    """Freshness sidecar: last check time, HTTP validators and accession of the cached 10-K"""
+    try:
+        return json.loads(_filing_meta_file(ticker).read_text(encoding="utf-8"))
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+def write_filing_meta(ticker: str, meta: dict):
+    SEC_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    _filing_meta_file(ticker).write_text(json.dumps(meta), encoding="utf-8")
+
+
+def build_section_index(text: str) -> dict[str, list[int]]:
+    """
+    Locate every 10-K item in the text: {item: [start, end]} character offsets.
+
+    Each item heading shows up several times (table of contents, running page
+    headers, the real heading). Items are resolved in filing order, and for each
+    one the occurrence giving the longest span up to the next later item wins -
+    table-of-contents hits are immediately followed by the next entry, so they lose.
+    """
+    rank = {item: i for i, item in enumerate(ITEM_ORDER)}
+    candidates: dict[str, list[int]] = {}
+    for match in ITEM_HEADING.finditer(text):
+        item = match.group(1).upper()
+        if item in rank:
+            candidates.setdefault(item, []).append(match.start())
+    
+    index = {}
+    floor = -1  # sections must appear in filing order
+    for item in ITEM_ORDER:
+        if item not in candidates:
+            continue
+        later = sorted(
+            pos for other, positions in candidates.items()
+            if rank[other] > rank[item] for pos in positions
+        )
+        best = None
+        for start in candidates[item]:
+            if start <= floor:
+                continue
+            i = bisect.bisect_right(later, start)
+            end = later[i] if i < len(later) else len(text)
+            if best is None or end - start > best[1] - best[0]:
+                best = [start, end]
+        if best:
+            index[item] = best
+            floor = best[0]
+    return index
+
+
+def _section_index_file(ticker: str) -> Path:
+    return SEC_CACHE_DIR / f"{ticker.upper()}_10k.sections.json"
+
+
+def write_section_index(ticker: str, text: str, source_url: str) -> dict[str, list[int]]:
+    """Compute the item offsets of a cached filing and persist them as a sidecar"""
+    ticker = ticker.upper()
+    entry = {"source": source_url, "length": len(text), "sections": build_section_index(text)}
+    SEC_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    _section_index_file(ticker).write_text(json.dumps(entry), encoding="utf-8")
+    _section_indexes[ticker] = entry
+    return entry["sections"]
+
+
+def get_section_index(ticker: str, text: str, source_url: str) -> dict[str, list[int]]:
+    """Section offsets for the cached filing (memory, then sidecar, else computed once)"""
+    ticker = ticker.upper()
+    
+    def matches(entry: dict | None) -> bool:
+        return bool(entry) and entry.get("source") == source_url and entry.get("length") == len(text)
+    
+    entry = _section_indexes.get(ticker)
+    if matches(entry):
+        return entry["sections"]
+    
+    try:
+        entry = json.loads(_section_index_file(ticker).read_text(encoding="utf-8"))
+    except (FileNotFoundError, ValueError):
+        entry = None
+    if matches(entry):
+        _section_indexes[ticker] = entry
+        return entry["sections"]
+    
+    return write_section_index(ticker, text, source_url)
+
+
+def extract_section(
+    text: str,
+    section: str,
+    detail_level: str = "summary",
+    offsets: dict[str, list[int]] | None = None,
+) -> str:
+    """
+    Extract a specific section from 10-K text with configurable detail level.
+    With a section index (see get_section_index) this is a plain slice of the
+    already-normalised cached text; otherwise fall back to regex scanning.
+    """
     
     # Section markers in 10-K (start_pattern, end_pattern)
     section_patterns = {
@@ -117,12 +338,35 @@ def extract_section(text: str, section: str, detail_level: str = "summary") -> s
     if section not in section_patterns:
         return text[:10000]
     
-    start_pattern, end_pattern = section_patterns[section]
+    item = SECTION_ITEMS.get(section)
+    if offsets and item in offsets:
+        # Cached text was normalised when it was written, no need to clean it again
+        start_pos, end_pos = offsets[item]
+        section_text = text[start_pos:end_pos]
+    else:
+        section_text = _search_section(text, *section_patterns[section])
+        if section_text is None:
+            return f"Section '{section}' not found in document."
     
+    # Apply formatting based on detail level
+    if detail_level == "summary":
+        # Smart extraction: categorized key points
+        if section == "risk_factors":
+            return format_risk_factors(section_text)
+        else:
+            # For other sections, return first 5000 chars
+            return section_text[:5000] + "\n\n[... use detail_level='detailed' for full content ...]"
+    else:
+        # Detailed mode: return more content
+        return section_text[:20000]
+
+
+def _search_section(text: str, start_pattern: str, end_pattern: str) -> str | None:
+    """Regex fallback for texts without a section index"""
     # Find section start
     start_match = re.search(start_pattern, text, re.IGNORECASE)
     if not start_match:
-        return f"Section '{section}' not found in document."
+        return None
     
     start_pos = start_match.start()
     
@@ -140,18 +384,7 @@ def extract_section(text: str, section: str, detail_level: str = "summary") -> s
     # Clean up whitespace but preserve some structure
     section_text = re.sub(r'\n\s*\n', '\n\n', section_text)
     section_text = re.sub(r'[ \t]+', ' ', section_text)
-    
-    # Apply formatting based on detail level
-    if detail_level == "summary":
-        # Smart extraction: categorized key points
-        if section == "risk_factors":
-            return format_risk_factors(section_text)
-        else:
-            # For other sections, return first 5000 chars
-            return section_text[:5000] + "\n\n[... use detail_level='detailed' for full content ...]"
-    else:
-        # Detailed mode: return more content
-        return section_text[:20000]
+    return section_text
 
 
 def format_risk_factors(text: str) -> str:
@@ -227,20 +460,21 @@ def format_risk_factors(text: str) -> str:
 
 
 def clean_old_cache(ticker: str):
-    """Delete old cache files and FAISS index for a ticker"""
-    import shutil
+    """
+    Delete the old cached filing text and its section index for a ticker.
+    The FAISS index is kept: ensure_sec_index notices the new source URL and
+    updates it incrementally, so unchanged passages are not re-embedded.
+    """
     ticker = ticker.upper()
     
     cache_file = SEC_CACHE_DIR / f"{ticker}_10k.txt"
-    faiss_dir = SEC_CACHE_DIR / f"{ticker}_faiss"
     
     if cache_file.exists():
         cache_file.unlink()
         logger.info(f"🗑️ Deleted old cache: {cache_file.name}")
     
-    if faiss_dir.exists():
-        shutil.rmtree(faiss_dir)
-        logger.info(f"🗑️ Deleted old FAISS index: {faiss_dir.name}")
+    _section_index_file(ticker).unlink(missing_ok=True)
+    _section_indexes.pop(ticker, None)
 
 
 def get_cached_source_url(ticker: str) -> str | None:
@@ -270,25 +504,50 @@ def download_and_cache_filing(ticker: str) -> tuple[str, str, bool]:
     ticker = ticker.upper()
     cache_file = SEC_CACHE_DIR / f"{ticker}_10k.txt"
     
+    cached_url = get_cached_source_url(ticker)
+    meta = read_filing_meta(ticker) or {}
+    
+    def load_cached() -> str:
+        text = cache_file.read_text(encoding="utf-8")
+        lines = text.split("\n", 2)
+        return lines[2] if len(lines) > 2 else text
+    
+    # 10-Ks change once a year: within the freshness window, trust the cache without asking SEC
+    check_window = get_settings().sec_filing_check_hours * 3600
+    if cached_url and meta.get("url") == cached_url and time.time() - meta.get("checked_at", 0) < check_window:
+        logger.info(f"📂 Loading cached 10-K for {ticker} (checked recently)")
+        return load_cached(), cached_url, True
+    
     # Get CIK and latest filing URL from SEC
     cik = get_company_cik(ticker)
     if not cik:
         raise ValueError(f"Company {ticker} not found in SEC database")
     
-    latest_url = get_latest_10k_url(cik)
-    if not latest_url:
+    # Conditional GET only makes sense if we know which filing the validators belong to
+    if meta.get("url"):
+        latest = check_latest_10k(cik, meta.get("etag"), meta.get("last_modified"))
+    else:
+        latest = check_latest_10k(cik)
+    if latest and latest["not_modified"]:
+        # Submissions feed unchanged since the last check
+        latest = {**meta, **latest}
+    if not latest:
         raise ValueError(f"No 10-K filing found for {ticker}")
     
-    # Check if cache exists and is up-to-date
-    cached_url = get_cached_source_url(ticker)
+    latest_url = latest["url"]
+    write_filing_meta(ticker, {
+        "url": latest_url,
+        "accession": latest.get("accession"),
+        "etag": latest.get("etag"),
+        "last_modified": latest.get("last_modified"),
+        "checked_at": time.time(),
+    })
     
+    # Check if cache exists and is up-to-date
     if cached_url and cached_url == latest_url:
         # Cache is current, use it
         logger.info(f"📂 Loading cached 10-K for {ticker} (up-to-date)")
-        text = cache_file.read_text(encoding="utf-8")
-        lines = text.split("\n", 2)
-        text = lines[2] if len(lines) > 2 else text
-        return text, latest_url, True
+        return load_cached(), latest_url, True
     
     if cached_url and cached_url != latest_url:
         # Newer version available, delete old cache
@@ -298,107 +557,103 @@ def download_and_cache_filing(ticker: str) -> tuple[str, str, bool]:
     # Download from SEC
     logger.info(f"⬇️ Downloading 10-K for {ticker} from SEC...")
     
-    headers = {"User-Agent": "YahooFinanceAgent research@example.com"}
-    response = requests.get(latest_url, headers=headers, timeout=60)
+    response = get_edgar_client().get(latest_url, timeout=60)
     
     if response.status_code != 200:
         raise ValueError(f"Failed to download filing: HTTP {response.status_code}")
     
-    # Clean HTML and remove XBRL tags
-    from bs4 import BeautifulSoup
-    soup = BeautifulSoup(response.content, 'html.parser')
-    
-    # Remove scripts, styles, and XBRL inline tags
-    for tag in soup(['script', 'style', 'ix:nonfraction', 'ix:nonnumeric', 'ix:header', 'ix:hidden']):
-        tag.decompose()
-    
-    # Remove all ix: namespace tags but keep their text content
-    for tag in soup.find_all(re.compile(r'^ix:')):
-        tag.unwrap()
-    
-    text = soup.get_text(separator='\n')
-    
-    # Clean up XBRL metadata at the beginning (lines with : that look like metadata)
-    lines = text.split('\n')
-    clean_lines = []
-    skip_header = True
-    for line in lines:
-        line = line.strip()
-        # Skip XBRL-like metadata lines at the beginning
-        if skip_header:
-            if re.match(r'^[\w-]+:[\w-]+$', line) or re.match(r'^\d{4}-\d{2}-\d{2}$', line) or re.match(r'^\d{10}$', line):
-                continue
-            if line and not line.startswith('0001') and len(line) > 20:
-                skip_header = False
-        if not skip_header:
-            clean_lines.append(line)
-    
-    text = '\n'.join(clean_lines)
-    text = re.sub(r'\n\s*\n', '\n\n', text)  # Preserve paragraph structure
-    text = re.sub(r'[ \t]+', ' ', text)
+    # Strip inline XBRL and normalise into paragraphs (lxml streaming parse, bs4 fallback)
+    text = html_to_text(response.content)
     
     # Save to cache
     SEC_CACHE_DIR.mkdir(parents=True, exist_ok=True)
     cache_content = f"SOURCE:{latest_url}\n---\n{text}"
     cache_file.write_text(cache_content, encoding="utf-8")
+    write_section_index(ticker, text, latest_url)
     logger.info(f"💾 Cached 10-K for {ticker} ({len(text):,} chars)")
     
     return text, latest_url, False
 
 
+def ensure_sec_index(ticker: str):
+    """
+    Load the ticker's FAISS index (shared per process, reloaded when another
+    process rebuilds it). If it is missing or was
+    built from an older filing, sync it incrementally with the cached 10-K.
+    """
+    from langchain_text_splitters import RecursiveCharacterTextSplitter
+    from rag import get_embeddings
+    from vector_index import get_vector_store, sync_vector_store, vector_store_version
+    
+    ticker = ticker.upper()
+    cache_file = SEC_CACHE_DIR / f"{ticker}_10k.txt"
+    index_dir = SEC_CACHE_DIR / f"{ticker}_faiss"
+    
+    if not cache_file.exists():
+        raise ValueError("Document not cached. Please fetch the document first.")
+    
+    embeddings = get_embeddings()
+    source_url = get_cached_source_url(ticker)
+    
+    # Load (shared per process); the index is tagged with the filing URL it was built from
+    vector_store = get_vector_store(index_dir, embeddings)
+    if vector_store is None or vector_store_version(index_dir) != source_url:
+        logger.info(f"🔨 Syncing FAISS index for {ticker}...")
+        text = cache_file.read_text(encoding="utf-8")
+        # Skip metadata header
+        if "---\n" in text:
+            text = text.split("---\n", 1)[1]
+        
+        # Split into chunks
+        splitter = RecursiveCharacterTextSplitter(
+            chunk_size=2000,
+            chunk_overlap=200,
+            separators=["\n\n", "\n", ". ", " "]
+        )
+        chunks = splitter.create_documents([text])
+        logger.info(f"📄 Created {len(chunks)} chunks")
+        
+        # Only chunks that changed since the previous filing are embedded
+        vector_store, stats = sync_vector_store(index_dir, chunks, embeddings, version=source_url)
+        logger.info(f"💾 Saved FAISS index for {ticker} ({stats['added']} new chunks, {stats['removed']} removed)")
+    
+    return vector_store
+
+
+def prefetch_filing(ticker: str) -> dict:
+    """
+    Warm every cache an interactive SEC question needs: latest 10-K text,
+    its section index and its FAISS index. Used by the background prefetcher.
+    """
+    text, filing_url, from_cache = download_and_cache_filing(ticker)
+    get_section_index(ticker, text, filing_url)
+    vector_store = ensure_sec_index(ticker)
+    return {
+        "source": filing_url,
+        "downloaded": not from_cache,
+        "chars": len(text),
+        "vectors": vector_store.index.ntotal,
+    }
+
+
 def rag_query_sec(ticker: str, question: str) -> str:
     """
     Use FAISS RAG to query cached SEC document.
     Requires document to be cached first.
     """
     try:
-        from langchain_openai import OpenAIEmbeddings, ChatOpenAI
-        from langchain_community.vectorstores import FAISS
-        from langchain_text_splitters import RecursiveCharacterTextSplitter
+        from langchain_openai import ChatOpenAI
         from langchain_core.prompts import ChatPromptTemplate
         from langchain_core.output_parsers import StrOutputParser
-        from config import get_settings
         
         ticker = ticker.upper()
         cache_file = SEC_CACHE_DIR / f"{ticker}_10k.txt"
-        index_dir = SEC_CACHE_DIR / f"{ticker}_faiss"
         
         if not cache_file.exists():
             return "Document not cached. Please fetch the document first."
         
         settings = get_settings()
-        embeddings = OpenAIEmbeddings(
-            model=settings.embedding_model,
-            api_key=settings.openai_api_key
-        )
-        
-        # Load or build FAISS index
-        if index_dir.exists():
-            logger.info(f"📊 Loading FAISS index for {ticker}")
-            vector_store = FAISS.load_local(
-                str(index_dir), embeddings, 
-                allow_dangerous_deserialization=True
-            )
-        else:
-            logger.info(f"🔨 Building FAISS index for {ticker}...")
-            text = cache_file.read_text(encoding="utf-8")
-            # Skip metadata header
-            if "---\n" in text:
-                text = text.split("---\n", 1)[1]
-            
-            # Split into chunks
-            splitter = RecursiveCharacterTextSplitter(
-                chunk_size=2000,
-                chunk_overlap=200,
-                separators=["\n\n", "\n", ". ", " "]
-            )
-            chunks = splitter.create_documents([text])
-            logger.info(f"📄 Created {len(chunks)} chunks")
-            
-            # Build index
-            vector_store = FAISS.from_documents(chunks, embeddings)
-            vector_store.save_local(str(index_dir))
-            logger.info(f"💾 Saved FAISS index for {ticker}")
+        vector_store = ensure_sec_index(ticker)
         
         # Retrieve relevant chunks
         retriever = vector_store.as_retriever(search_kwargs={"k": 5})
@@ -494,7 +749,8 @@ def get_sec_filing(
             }
         else:
             # Direct extraction mode
-            section_text = extract_section(text, section, detail_level)
+            offsets = get_section_index(ticker, text, filing_url)
+            section_text = extract_section(text, section, detail_level, offsets)
             
             return {
                 "ticker": ticker,
@@ -507,7 +763,7 @@ def get_sec_filing(
                 "content": section_text
             }
         
-    except requests.Timeout:
+    except httpx.TimeoutException:
         return {"error": "Request timeout - SEC server may be slow"}
     except ValueError as e:
         return {"error": str(e)}
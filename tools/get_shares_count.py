@@ -1,7 +1,8 @@
 from langchain_core.tools import tool
 from pydantic import BaseModel, Field
 from enum import Enum
-import yfinance as yf
+from market_data import get_shares_full
+from .serialization import compact_frame
 
 
 # Define the input schema for the tool
@@ -15,10 +16,7 @@ class SharesCountInput(BaseModel):
 def get_shares_count(ticker: str, start: str, end: str = None):
     """Fetch the number of shares outstanding over a specified date range."""
     
-    stock = yf.Ticker(ticker)
-    shares_count = stock.get_shares_full(start=start, end=end)
+    shares_count = get_shares_full(ticker, start=start, end=end)
     
-    # Convert the DataFrame to a dictionary for easy serialization
-    shares_count_dict = shares_count.to_dict()
-    
-    return shares_count_dict
+    # Compact CSV (most recent rows kept if over the token budget)
+    return compact_frame(shares_count, "get_shares_count", keep="tail")
@@ -1,7 +1,7 @@
 # Description: A tool to fetch stock information for a given ticker symbol.
 from langchain_core.tools import tool
 from pydantic import BaseModel, Field
-import yfinance as yf
+from market_data import get_info
 
 
 class StockInfoInput(BaseModel):
@@ -12,8 +12,7 @@ class StockInfoInput(BaseModel):
 def get_stock_info(ticker: str) -> dict:
     """Fetch key stock information for a given ticker symbol including price, market cap, PE ratio, etc."""
     try:
-        stock = yf.Ticker(ticker)
-        info = stock.info
+        info = get_info(ticker)
         
         if not info or info.get("regularMarketPrice") is None:
             return {"error": f"Unable to fetch data for {ticker}. Please check the ticker symbol."}
@@ -0,0 +1,133 @@
+# Description: Compact, token-budgeted serialization of DataFrame tool results for the LLM
+import math
+import numbers
+from typing import Literal
+
+import pandas as pd
+
+from config import get_settings
+
+# Rough token estimate for CSV-like text (avoids loading a tokenizer per tool call)
+CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(text: str) -> int:
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def token_budget(tool_name: str) -> int:
+    """Token budget for a tool's output, from Settings.tool_token_budgets."""
+    budgets = get_settings().tool_token_budgets
+    return budgets.get(tool_name, budgets.get("default", 1500))
+
+
+def format_number(value, decimals: int = 2) -> str:
+    """Round floats and abbreviate large magnitudes (391035000000 -> 391.04B)."""
+    if value is None or (isinstance(value, float) and math.isnan(value)):
+        return ""
+    if isinstance(value, pd.Timestamp):
+        return _format_label(value)
+    if isinstance(value, numbers.Real) and not isinstance(value, bool):
+        magnitude = abs(value)
+        if magnitude >= 1e12:
+            return f"{value / 1e12:.{decimals}f}T"
+        if magnitude >= 1e9:
+            return f"{value / 1e9:.{decimals}f}B"
+        if magnitude >= 1e6:
+            return f"{value / 1e6:.{decimals}f}M"
+        if float(value).is_integer():
+            return str(int(value))
+        return f"{value:.{decimals}f}".rstrip("0").rstrip(".")
+    return str(value)
+
+
+def _format_label(label) -> str:
+    if isinstance(label, pd.Timestamp):
+        if label.hour == label.minute == label.second == 0:
+            return label.strftime("%Y-%m-%d")
+        return label.strftime("%Y-%m-%d %H:%M")
+    return str(label)
+
+
+def _to_csv(df: pd.DataFrame, decimals: int) -> list[str]:
+    """Header line + one line per row, values formatted and NaN left blank."""
+    header = ",".join([_format_label(df.index.name or "")] + [_format_label(c) for c in df.columns])
+    lines = [header]
+    for label, row in zip(df.index, df.itertuples(index=False, name=None)):
+        cells = [_format_label(label)] + [format_number(v, decimals).replace(",", ";") for v in row]
+        lines.append(",".join(cells))
+    return lines
+
+
+def _summary(df: pd.DataFrame, decimals: int) -> dict:
+    """min / max / mean / last for numeric columns (describes rows that were cut)."""
+    summary = {}
+    for column in df.select_dtypes("number").columns:
+        series = df[column].dropna()
+        if series.empty:
+            continue
+        summary[_format_label(column)] = {
+            "min": format_number(series.min(), decimals),
+            "max": format_number(series.max(), decimals),
+            "mean": format_number(series.mean(), decimals),
+            "last": format_number(series.iloc[-1], decimals),
+        }
+    return summary
+
+
+def compact_frame(
+    data: pd.DataFrame | pd.Series,
+    tool_name: str,
+    keep: Literal["head", "tail", "center"] = "head",
+    center: int | None = None,
+    decimals: int = 2,
+    drop_zero_columns: bool = False,
+) -> dict:
+    """
+    Serialize a DataFrame as a compact CSV table that fits the tool's token budget.
+
+    - Timestamps become dates, floats are rounded, large numbers abbreviated
+    - All-NaN rows/columns are dropped (and all-zero columns if requested)
+    - If the table is over budget, rows are capped (keeping the head, tail or a
+      window around `center`) and summary stats over all rows are attached
+    """
+    if data is None:
+        return {"rows": 0, "table": ""}
+    df = data.to_frame() if isinstance(data, pd.Series) else data
+    df = df.dropna(how="all").dropna(axis=1, how="all")
+    if drop_zero_columns:
+        numeric = df.select_dtypes("number")
+        df = df.drop(columns=[c for c in numeric.columns if (numeric[c] == 0).all()])
+
+    if df.empty:
+        return {"rows": 0, "table": ""}
+
+    budget = token_budget(tool_name)
+    lines = _to_csv(df, decimals)
+    header, rows = lines[0], lines[1:]
+    total = len(rows)
+
+    if estimate_tokens("\n".join(lines)) <= budget:
+        return {"rows": total, "table": "\n".join(lines)}
+
+    # Over budget: reserve room for the summary, then fit as many rows as possible
+    summary = _summary(df, decimals)
+    remaining = budget - estimate_tokens(header) - estimate_tokens(str(summary))
+    avg_row = max(1, estimate_tokens("\n".join(rows)) / total)
+    limit = max(1, min(total, int(remaining / avg_row)))
+
+    if keep == "tail":
+        shown = rows[-limit:]
+    elif keep == "center" and center is not None:
+        start = min(max(0, center - limit // 2), total - limit)
+        shown = rows[start:start + limit]
+    else:
+        shown = rows[:limit]
+
+    return {
+        "rows": total,
+        "shown": len(shown),
+        "note": f"Showing {len(shown)} of {total} rows ({keep}); summary covers all rows.",
+        "table": "\n".join([header] + shown),
+        "summary": summary,
+    }
@@ -0,0 +1,313 @@
+"""
+进程级共享的 FAISS 向量索引
+
+同一路径的索引每个进程加载一次，所有对话只读共享；对话自身只保存聊天历史。
+每次访问 stat 一次 manifest.json，其他进程切换了版本时重新加载。
+
+更新采用增量 + 写时复制: sync_vector_store 按分块内容哈希与现有索引比对，
+只删除消失的分块、只嵌入新增的分块，在副本上修改后整体替换，
+查询始终看到完整的旧索引或新索引。同一路径同时只有一个构建在执行，
+并发的调用方等待并共享它的结果。
+
+磁盘布局 (path 为索引目录):
+    manifest.json   {"dir": 当前版本目录, "version": 数据版本}
+    v-{id}/         index.faiss / index.pkl
+新版本写完后用 os.replace 替换 manifest.json 切换，path 始终存在，
+其他进程的读者在任何时刻都能读到一个完整的版本。
+旧布局 (index.faiss 直接位于 path 下，manifest 没有 "dir") 仍可读取，下次写入时迁移。
+"""
+import copy
+import hashlib
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+import uuid
+from pathlib import Path
+
+from langchain_community.docstore.in_memory import InMemoryDocstore
+from langchain_community.vectorstores import FAISS
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+
+from cache import SingleFlight
+
+logger = logging.getLogger(__name__)
+
+# 索引目录内指向当前版本目录、记录数据版本 (如 10-K 的来源 URL) 的文件
+MANIFEST_FILE = "manifest.json"
+# 旧布局下直接位于索引目录中的文件
+LEGACY_FILES = ("index.faiss", "index.pkl")
+# 不再被引用的版本目录保留这么久 (秒) 再删除，给正在加载它的其他进程留出时间
+STALE_SECONDS = 60
+# 读者加载时版本目录恰好被删除 (连续两次切换) 的重试次数
+LOAD_ATTEMPTS = 3
+
+# 已加载的索引 (按路径)
+_stores: dict[str, FAISS] = {}
+_dirs: dict[str, str] = {}  # 已加载的版本目录名
+_stamps: dict[str, tuple | None] = {}  # 加载时 manifest.json 的 stat (判断磁盘上是否切换了版本)
+_locks: dict[str, threading.Lock] = {}
+_locks_guard = threading.Lock()
+# 进行中的构建 (按路径合并)
+_builds = SingleFlight()
+
+
+def _key(path: Path) -> str:
+    return str(Path(path).resolve())
+
+
+def _path_lock(key: str) -> threading.Lock:
+    with _locks_guard:
+        return _locks.setdefault(key, threading.Lock())
+
+
+def _read_manifest(path: Path) -> dict:
+    try:
+        return json.loads((Path(path) / MANIFEST_FILE).read_text(encoding="utf-8"))
+    except (FileNotFoundError, ValueError):
+        return {}
+
+
+def _read_version(path: Path) -> str | None:
+    return _read_manifest(path).get("version")
+
+
+def _active_dir(path: Path) -> Path | None:
+    """当前版本所在目录 (旧布局为 path 本身)，没有索引时返回 None"""
+    path = Path(path)
+    manifest = _read_manifest(path)
+    if manifest.get("dir"):
+        return path / manifest["dir"]
+    if (path / LEGACY_FILES[0]).exists():
+        return path
+    return None
+
+
+def _stamp(path: Path) -> tuple | None:
+    """manifest.json (旧布局为 index.faiss) 的 inode + mtime，os.replace 切换后必然变化"""
+    for name in (MANIFEST_FILE, LEGACY_FILES[0]):
+        try:
+            st = os.stat(Path(path) / name)
+        except FileNotFoundError:
+            continue
+        return name, st.st_ino, st.st_mtime_ns
+    return None
+
+
+def _load(path: Path, embeddings: Embeddings) -> tuple[FAISS, Path] | None:
+    """加载当前版本；加载途中版本目录被并发写入者清理时重读 manifest 重试"""
+    for attempt in range(LOAD_ATTEMPTS):
+        directory = _active_dir(path)
+        if directory is None:
+            return None
+        try:
+            store = FAISS.load_local(str(directory), embeddings, allow_dangerous_deserialization=True)
+            return store, directory
+        except Exception:
+            if attempt == LOAD_ATTEMPTS - 1 or _active_dir(path) == directory:
+                raise
+            logger.info(f"Index {path} switched while loading, retrying")
+
+
+def get_vector_store(path: Path, embeddings: Embeddings) -> FAISS | None:
+    """
+    获取共享索引: 已加载且磁盘上没有切换版本时直接返回，否则从磁盘 (重新) 加载
+    磁盘上不存在时返回 None
+    """
+    key = _key(path)
+    stamp = _stamp(path)
+    store = _stores.get(key)
+    if store is not None and _stamps.get(key) == stamp:
+        return store
+
+    with _path_lock(key):
+        store = _stores.get(key)
+        if store is not None and _stamps.get(key) == stamp:
+            return store
+        if stamp is None:
+            drop_vector_store(path)
+            return None
+
+        # 只改了数据版本 (manifest 指向同一目录) 时不必重新加载
+        directory = _active_dir(path)
+        if store is not None and directory is not None and directory.name == _dirs.get(key):
+            _stamps[key] = stamp
+            return store
+
+        logger.info(f"📊 Loading FAISS index from {path}")
+        loaded = _load(path, embeddings)
+        if loaded is None:
+            drop_vector_store(path)
+            return None
+        store, directory = loaded
+        _stores[key] = store
+        _dirs[key] = directory.name
+        _stamps[key] = stamp
+        return store
+
+
+def vector_store_version(path: Path) -> str | None:
+    """索引对应的数据版本 (sync_vector_store 时写入 manifest.json)"""
+    return _read_version(path)
+
+
+def set_vector_store(path: Path, store: FAISS, directory: str | None = None):
+    """注册 (或替换) 某路径的共享索引，directory 为它在磁盘上的版本目录名"""
+    key = _key(path)
+    _stores[key] = store
+    _dirs[key] = directory
+    # 下次访问时读一次 manifest 核对 (期间其他进程可能又切换了版本)
+    _stamps[key] = None
+
+
+def drop_vector_store(path: Path):
+    """从内存中移除某路径的索引"""
+    key = _key(path)
+    _stores.pop(key, None)
+    _dirs.pop(key, None)
+    _stamps.pop(key, None)
+
+
+def chunk_ids(texts: list[str]) -> list[str]:
+    """分块的内容 ID (内容哈希，重复内容追加序号)"""
+    seen: dict[str, int] = {}
+    ids = []
+    for text in texts:
+        digest = hashlib.sha256(text.encode("utf-8")).hexdigest()[:32]
+        n = seen.get(digest, 0)
+        seen[digest] = n + 1
+        ids.append(f"{digest}-{n}")
+    return ids
+
+
+def _copy_store(store: FAISS, embeddings: Embeddings) -> FAISS:
+    """复制索引，修改副本不影响正在查询的原索引"""
+    import faiss
+    clone = copy.copy(store)
+    clone.embedding_function = embeddings
+    clone.index = faiss.clone_index(store.index)
+    clone.docstore = InMemoryDocstore(dict(store.docstore._dict))
+    clone.index_to_docstore_id = dict(store.index_to_docstore_id)
+    return clone
+
+
+def _save_atomic(store: FAISS, path: Path, version: str | None) -> str:
+    """写入新的版本目录，再原子替换 manifest.json 切换过去，返回版本目录名"""
+    path = Path(path)
+    path.mkdir(parents=True, exist_ok=True)
+    previous = _read_manifest(path)
+    name = f"v-{uuid.uuid4().hex[:8]}"
+    tmp = path / f".tmp-{name}"
+
+    store.save_local(str(tmp))
+    os.rename(tmp, path / name)
+    _write_manifest(path, {"dir": name, "version": version})
+    _cleanup(path, keep={name, previous.get("dir")}, legacy_in_use=not previous.get("dir"))
+    return name
+
+
+def _cleanup(path: Path, keep: set, legacy_in_use: bool):
+    """删除不再引用的旧版本 (上一个版本保留，可能仍有读者在加载)"""
+    now = time.time()
+    for entry in path.iterdir():
+        if not entry.is_dir() or entry.name in keep:
+            continue
+        if not (entry.name.startswith("v-") or entry.name.startswith(".tmp-")):
+            continue
+        try:
+            # 其他进程刚写好 / 正在写的目录不删
+            if now - entry.stat().st_mtime < STALE_SECONDS:
+                continue
+        except FileNotFoundError:
+            continue
+        shutil.rmtree(entry, ignore_errors=True)
+    if not legacy_in_use:
+        for name in LEGACY_FILES:
+            (path / name).unlink(missing_ok=True)
+
+
+def _write_manifest(path: Path, manifest: dict):
+    tmp = Path(path) / f"{MANIFEST_FILE}.tmp-{uuid.uuid4().hex[:8]}"
+    tmp.write_text(json.dumps(manifest), encoding="utf-8")
+    os.replace(tmp, Path(path) / MANIFEST_FILE)
+
+
+def sync_vector_store(
+    path: Path,
+    documents: list[Document],
+    embeddings: Embeddings,
+    version: str | None = None,
+) -> tuple[FAISS, dict]:
+    """
+    让 path 处的索引与 documents 一致 (增量): 删除消失的分块，只嵌入新增的分块。
+    索引不存在时完整构建。完成后替换磁盘和内存中的索引。
+    同一路径已有构建在执行时，等待它完成；它构建的不是同一组文档 / 版本时再同步一次。
+    Returns: (store, {"added", "removed", "kept"})
+    """
+    key = _key(path)
+    ids = chunk_ids([doc.page_content for doc in documents])
+    fingerprint = (version, hashlib.sha256("\n".join(ids).encode("utf-8")).hexdigest())
+    while True:
+        store, stats, built = _builds.do(key, lambda: _sync(path, documents, ids, embeddings, version, fingerprint))
+        if built == fingerprint:
+            return store, stats
+
+
+def _sync(
+    path: Path,
+    documents: list[Document],
+    ids: list[str],
+    embeddings: Embeddings,
+    version: str | None,
+    fingerprint: tuple,
+) -> tuple[FAISS, dict, tuple]:
+    wanted = dict(zip(ids, documents))
+
+    try:
+        current = get_vector_store(path, embeddings)
+    except Exception as e:
+        logger.warning(f"Failed to load index {path} ({e}), rebuilding from scratch")
+        current = None
+
+    if current is None:
+        store = FAISS.from_documents(documents, embeddings, ids=ids)
+        stats = {"added": len(ids), "removed": 0, "kept": 0}
+    else:
+        # 旧索引可能是随机 ID，统一按内容重新计算后比对
+        existing_doc_ids = [current.index_to_docstore_id[i] for i in sorted(current.index_to_docstore_id)]
+        texts = [current.docstore.search(doc_id).page_content for doc_id in existing_doc_ids]
+        existing = dict(zip(chunk_ids(texts), existing_doc_ids))
+
+        removed = [doc_id for cid, doc_id in existing.items() if cid not in wanted]
+        added = [cid for cid in wanted if cid not in existing]
+        stats = {"added": len(added), "removed": len(removed), "kept": len(existing) - len(removed)}
+
+        if not added and not removed:
+            if vector_store_version(path) != version:
+                _write_manifest(path, {**_read_manifest(path), "version": version})
+            logger.info(f"📊 Index {path} already up to date")
+            return current, stats, fingerprint
+
+        store = _copy_store(current, embeddings)
+        if removed:
+            store.delete(removed)
+        if added:
+            store.add_documents([wanted[cid] for cid in added], ids=added)
+
+    directory = _save_atomic(store, path, version)
+    set_vector_store(path, store, directory)
+    logger.info(f"📊 Synced index {path}: {stats}")
+    return store, stats, fingerprint
+
+
+def loaded_indexes() -> dict[str, int]:
+    """已加载的索引及其向量数"""
+    return {key: store.index.ntotal for key, store in _stores.items()}
+
+
+def build_stats() -> dict:
+    """构建合并统计"""
+    return _builds.stats()